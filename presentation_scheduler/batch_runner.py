@@ -0,0 +1,225 @@
+import hybrid_system as hs
+import precompile as pr
+import telemetry as tm
+import argparse
+import contextlib
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from timeit import default_timer as timer
+
+# job of a batch: unique name, directory of input files, directory of result files and options of hybrid_system
+Job = namedtuple("Job", ["name", "input_directory", "output_directory", "options"])
+
+# options of hybrid_system which can be given for each job
+option_names = ("result_format", "seed", "cache_capacity", "time_budget", "target_penalty_point", "stall_limit",
+                "tabu_iterations", "migration_interval", "topology", "annealing")
+
+
+# unique name of a job, which is also the name of its output directory
+def unique_name(name, output_root, names):
+    unique = name
+    suffix = 1
+
+    while unique in names or os.path.exists(os.path.join(output_root, unique)):
+        suffix += 1
+        unique = f"{name}-{suffix}"
+
+    names.add(unique)
+    return unique
+
+
+# create a job from an entry of a manifest: an input directory or an object with input_directory and optionally
+# name, output_directory and options of hybrid_system (relative paths are relative to base_directory)
+def create_job(entry, output_root, names, base_directory="."):
+    if isinstance(entry, str):
+        entry = {"input_directory": entry}
+
+    unknown_options = set(entry) - {"name", "input_directory", "output_directory"} - set(option_names)
+
+    if unknown_options:
+        raise ValueError(f"Unknown options of job: {', '.join(sorted(unknown_options))}")
+
+    input_directory = os.path.join(base_directory, entry["input_directory"])
+    name = unique_name(entry.get("name", os.path.basename(os.path.normpath(input_directory))), output_root, names)
+    output_directory = os.path.join(base_directory, entry["output_directory"]) if "output_directory" in entry else \
+        os.path.join(output_root, name)
+    return Job(name, input_directory, output_directory, {option: entry[option] for option in option_names
+                                                         if option in entry})
+
+
+# read jobs from a manifest (JSON list of entries accepted by create_job)
+def read_manifest(path, output_root):
+    with open(path) as file:
+        entries = json.load(file)
+
+    names = set()
+    return [create_job(entry, output_root, names, os.path.dirname(path)) for entry in entries]
+
+
+# compile functions and import output dependencies once in each worker process, later jobs of the worker reuse them
+def initialize_batch_worker():
+    pr.precompile()
+    import matplotlib.backends.backend_agg  # noqa: F401
+
+
+# create a pool of warm worker processes for jobs, each job runs process_no islands and annealing chains
+# (enough workers to use every processor core by default)
+def create_batch_pool(worker_no=None, process_no=1):
+    worker_no = max(os.cpu_count() // process_no, 1) if worker_no is None else worker_no
+    return ProcessPoolExecutor(worker_no, initializer=initialize_batch_worker)
+
+
+# solve a job in a worker process, output of the hybrid system goes to log.txt and telemetry.jsonl in the output
+# directory of the job
+# returns a report of the job: status, result, wall time and time of each phase
+def run_job(job, process_no=1):
+    os.makedirs(job.output_directory, exist_ok=True)
+    events = []
+    telemetry = tm.create(events.append, os.path.join(job.output_directory, "telemetry.jsonl"))
+    report = {"name": job.name, "input_directory": job.input_directory, "output_directory": job.output_directory}
+    start = timer()
+
+    try:
+        with open(os.path.join(job.output_directory, "log.txt"), 'w') as log, contextlib.redirect_stdout(log):
+            hs.hybrid_system(True, job.output_directory, telemetry=telemetry, input_directory=job.input_directory,
+                             process_no=process_no, **job.options).join()
+
+        report["status"] = "done"
+    except Exception as exception:
+        report.update(status="failed", error=f"{type(exception).__name__}: {exception}")
+    finally:
+        tm.close(telemetry)
+
+    report["seconds"] = round(timer() - start, 6)
+    report["phases"] = {event["name"]: event["seconds"] for event in events if event["event"] == "phase"}
+
+    for event in events:
+        if event["event"] == "result":
+            report.update({name: value for name, value in event.items() if name not in ("event", "time")})
+
+    return report
+
+
+# write a report of a job as a line of the batch report and print a summary of it
+def stream_report(report, report_file=None):
+    if report_file is not None:
+        report_file.write(json.dumps(report) + "\n")
+        report_file.flush()
+
+    result = f"penalty points {report['penalty_point']}" if report["status"] == "done" else report["error"]
+    print(f"[{report['name']}] {report['status']} in {report['seconds']:.2f} s: {result}")
+
+
+# solve jobs concurrently on a pool of worker processes, reports are streamed as jobs finish
+# returns reports of the jobs in the order in which they finished
+def run_batch(jobs, worker_no=None, process_no=1, report_path=None):
+    reports = []
+
+    with contextlib.ExitStack() as stack:
+        report_file = stack.enter_context(open(report_path, 'a')) if report_path is not None else None
+        pool = stack.enter_context(create_batch_pool(worker_no, process_no))
+        futures = [pool.submit(run_job, job, process_no) for job in jobs]
+
+        while futures:
+            finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                reports.append(future.result())
+                stream_report(reports[-1], report_file)
+
+    return reports
+
+
+# queue front-end - solve jobs dropped into a queue directory by warm workers until interrupted
+# each job is a JSON file with an entry accepted by create_job, it is moved to queue/running while it runs and its
+# report is written to queue/done (the name of the file is the default name of the job)
+# job files should be written under another extension and then renamed, so that a partial file is never read
+def watch_queue(queue_directory, output_root, worker_no=None, process_no=1, report_path=None, poll_interval=1.0):
+    running_directory = os.path.join(queue_directory, "running")
+    done_directory = os.path.join(queue_directory, "done")
+    os.makedirs(running_directory, exist_ok=True)
+    os.makedirs(done_directory, exist_ok=True)
+    names = set()
+    futures = {}
+
+    with contextlib.ExitStack() as stack:
+        report_file = stack.enter_context(open(report_path, 'a')) if report_path is not None else None
+        pool = stack.enter_context(create_batch_pool(worker_no, process_no))
+
+        try:
+            while True:
+                for filename in sorted(os.listdir(queue_directory)):
+                    if not filename.endswith(".json"):
+                        continue
+
+                    path = os.path.join(running_directory, filename)
+                    os.replace(os.path.join(queue_directory, filename), path)
+
+                    try:
+                        with open(path) as file:
+                            entry = json.load(file)
+
+                        entry = {"input_directory": entry} if isinstance(entry, str) else entry
+                        entry.setdefault("name", filename[:-len(".json")])
+                        job = create_job(entry, output_root, names, queue_directory)
+                    except (KeyError, ValueError) as exception:
+                        finish_queued_job(path, {"name": filename[:-len(".json")], "status": "failed",
+                                                 "seconds": 0.0, "error": f"{type(exception).__name__}: {exception}"},
+                                          done_directory, report_file)
+                        continue
+
+                    futures[pool.submit(run_job, job, process_no)] = path
+
+                finished = [future for future in futures if future.done()]
+
+                for future in finished:
+                    finish_queued_job(futures.pop(future), future.result(), done_directory, report_file)
+
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("Waiting for", len(futures), "running jobs")
+
+            for future, path in futures.items():
+                finish_queued_job(path, future.result(), done_directory, report_file)
+
+
+# write the report of a job of the queue and remove its job file
+def finish_queued_job(path, report, done_directory, report_file):
+    with open(os.path.join(done_directory, os.path.basename(path)), 'w') as file:
+        json.dump(report, file, indent=1)
+
+    os.remove(path)
+    stream_report(report, report_file)
+
+
+# command-line interface of the batch runner
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schedule presentations of many instances concurrently")
+    parser.add_argument("manifest", nargs="?",
+                        help="JSON list of jobs, each an input directory or an object with input_directory and "
+                             f"optionally name, output_directory, {', '.join(option_names)}")
+    parser.add_argument("--output-root", default="results", help="directory of output directories of jobs")
+    parser.add_argument("--workers", type=int, help="no. of jobs run concurrently (default: use every core)")
+    parser.add_argument("--processes", type=int, default=1, help="no. of islands and annealing chains of each job")
+    parser.add_argument("--report", metavar="PATH", help="append a JSON line of each finished job to a file")
+    parser.add_argument("--watch", metavar="QUEUE_DIRECTORY",
+                        help="keep warm workers and solve jobs dropped into a directory as JSON files")
+    arguments = parser.parse_args(argv)
+
+    if arguments.watch is not None:
+        watch_queue(arguments.watch, arguments.output_root, arguments.workers, arguments.processes, arguments.report)
+    elif arguments.manifest is not None:
+        start = timer()
+        reports = run_batch(read_manifest(arguments.manifest, arguments.output_root), arguments.workers,
+                            arguments.processes, arguments.report)
+        print(f"\n{sum(report['status'] == 'done' for report in reports)}/{len(reports)} jobs done in "
+              f"{timer() - start:.2f} seconds")
+    else:
+        parser.error("a manifest or --watch is required")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import data as dt
+import instance_generator as ig
+import penalty_function as pf
+import genetic_algorithm as ga
+import simulated_annealing as sa
+import schedule as sc
+import population as po
+import numpy as np
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from prettytable import PrettyTable
+from numba import njit
+from timeit import default_timer as timer
+
+input_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "input_files")
+
+
+# seed both NumPy's global generator and the generator of compiled functions
+def seed_all(seed):
+    np.random.seed(seed)
+    sc.seed_compiled_random(seed)
+
+
+# compiled harnesses of micro-benchmarks
+# each loop of operations runs in a single compiled call, hence the timings are of the compiled functions rather than
+# of calling compiled functions from Python (which is timed separately by call_overhead)
+# each harness returns a sum of its results, so that the operations are not optimized away
+
+
+# empty compiled function taking the problem instance, as most compiled functions do
+@njit(cache=True)
+def call_overhead(instance):
+    return 0
+
+
+@njit(cache=True)
+def penalty_loop(presentation_slot, instance, calls):
+    total = 0
+
+    for _ in range(calls):
+        total += pf.penalty(presentation_slot, instance)[0]
+
+    return total
+
+
+# moves of random neighbourhood structures proposed from a candidate
+@njit(cache=True)
+def propose_moves(candidate, instance, calls):
+    moves = np.zeros((calls, 2, 2), dtype=np.int16)
+    move_sizes = np.empty(calls, dtype=np.int64)
+
+    for i in range(calls):
+        move_sizes[i] = sa.neighbourhood_move(np.random.randint(4), candidate, moves[i], instance)
+
+    return moves, move_sizes
+
+
+@njit(cache=True)
+def delta_penalty_loop(presentation_slot, moves, move_sizes, instance):
+    day_time_slot, original_slots = pf.delta_buffers(instance)
+    total = 0
+
+    for i in range(len(moves)):
+        total += pf.delta_penalty(presentation_slot, moves[i], move_sizes[i], instance, day_time_slot, original_slots)
+
+    return total
+
+
+@njit(cache=True)
+def neighbourhood_structure_loop(structure, candidate, move, instance, calls):
+    total = 0
+
+    for _ in range(calls):
+        total += sa.neighbourhood_move(structure, candidate, move, instance)
+
+    return total
+
+
+@njit(cache=True)
+def crossover_loop(population, instance, calls):
+    population_size = population.shape[0]
+    total = 0
+
+    for _ in range(calls):
+        first = np.random.randint(population_size)
+        second = (first + 1 + np.random.randint(population_size - 1)) % population_size
+        first_child, second_child = ga.crossover(population[first], population[second], instance)
+        total += first_child.presentation_slot[0] + second_child.presentation_slot[0]
+
+    return total
+
+
+@njit(cache=True)
+def mutation_loop(chromosome, instance, calls):
+    total = 0
+
+    for _ in range(calls):
+        total += ga.mutation(chromosome, instance).presentation_slot[0]
+
+    return total
+
+
+# children as good as the best chromosomes are inserted at the front, others replace the worst
+@njit(cache=True)
+def replacement_loop(store, population, penalty_points, calls):
+    population_size = population.shape[0]
+
+    for i in range(calls):
+        ga.replacement(store, population[i % population_size], population[(i + 1) % population_size],
+                       penalty_points[0] - 1 - i, penalty_points[-1] + i % 2)
+
+    return calls
+
+
+# time a benchmark function returning the number of operations it performed (and their time if it prepares inputs
+# which should not be timed)
+# the first call is timed separately because it includes Numba compilation (or loading compiled cache)
+def measure(name, unit, function, repeats, seed):
+    seed_all(seed)
+    start = timer()
+    function()
+    compile_time = timer() - start
+    times = []
+    operations = 0
+
+    for repeat in range(repeats):
+        seed_all(seed + repeat)
+        start = timer()
+        operations = function()
+        time = timer() - start
+
+        if isinstance(operations, tuple):
+            operations, time = operations
+
+        times.append(time)
+
+    times = np.array(times)
+    rates = operations / times
+    return {"name": name, "unit": unit, "first_call": compile_time, "mean_time": times.mean(),
+            "std_time": times.std(), "mean_rate": rates.mean(), "std_rate": rates.std()}
+
+
+# micro-benchmarks of penalty function and operators
+def micro_benchmarks(instance, repeats, seed):
+    seed_all(seed)
+    population_size = 10
+    population = np.array([ga.generate_chromosome(instance).presentation_slot for _ in range(population_size)])
+    penalty_points = pf.batch_penalty(population, instance)[0]
+    order = penalty_points.argsort()
+    population, penalty_points = population[order], penalty_points[order]
+    candidate = sc.create_schedule(population[0], instance.availability.shape[0])
+    batch = np.repeat(population, 25, axis=0)
+    move = np.empty((2, 2), dtype=np.int16)
+    calls = 1000
+    results = []
+
+    def overhead():
+        for _ in range(calls):
+            call_overhead(instance)
+        return calls
+
+    def penalty():
+        penalty_loop(candidate.presentation_slot, instance, calls)
+        return calls
+
+    def batch_penalty():
+        pf.batch_penalty(batch, instance)
+        return len(batch)
+
+    def delta_penalty():
+        moves, move_sizes = propose_moves(candidate, instance, calls * 10)
+        start = timer()
+        delta_penalty_loop(candidate.presentation_slot, moves, move_sizes, instance)
+        return calls * 10, timer() - start
+
+    def neighbourhood_structure(structure):
+        def propose():
+            neighbourhood_structure_loop(structure, candidate, move, instance, calls * 10)
+            return calls * 10
+        return propose
+
+    def crossover():
+        crossover_loop(population, instance, calls // 10)
+        return calls // 10
+
+    def mutation():
+        mutation_loop(sc.create_schedule(population[0], instance.availability.shape[0]), instance, calls * 10)
+        return calls * 10
+
+    def replacement():
+        replacement_loop(po.create_population(population, penalty_points), population, penalty_points, calls)
+        return calls
+
+    def generation():
+        ga.reproduction(calls // 10, population, penalty_points, instance, verbose=False)
+        return calls // 5
+
+    def batch_generation():
+        ga.batch_reproduction(calls // 100, population, penalty_points, instance, batch_size=20)
+        return calls // 5
+
+    results.append(measure("call overhead (from Python)", "calls/s", overhead, repeats, seed))
+    results.append(measure("penalty", "evaluations/s", penalty, repeats, seed))
+    results.append(measure("batch_penalty", "evaluations/s", batch_penalty, repeats, seed))
+    results.append(measure("delta_penalty (with move)", "evaluations/s", delta_penalty, repeats, seed))
+
+    for structure in range(4):
+        results.append(measure(f"neighbourhood_structure{structure + 1}", "moves/s",
+                               neighbourhood_structure(structure), repeats, seed))
+
+    results.append(measure("crossover + repair", "crossovers/s", crossover, repeats, seed))
+    results.append(measure("mutation", "mutations/s", mutation, repeats, seed))
+    results.append(measure("replacement", "replacements/s", replacement, repeats, seed))
+    results.append(measure("generation", "children/s", generation, repeats, seed))
+    results.append(measure("batch generation", "children/s", batch_generation, repeats, seed))
+    return results
+
+
+# end-to-end runs of genetic algorithm and simulated annealing
+# time to target is the time until the best penalty points reach the target (None if never reached)
+def end_to_end_benchmarks(instance, repeats, seed, target_penalty_point):
+    population_size = 10
+    max_generations = 100
+    ga_times = []
+    sa_times = []
+    sa_moves = []
+    target_times = []
+    first_call = None
+
+    for repeat in range(repeats + 1):
+        seed_all(seed + repeat)
+        start = timer()
+        population = np.array([ga.generate_chromosome(instance).presentation_slot for _ in range(population_size)])
+        penalty_points = pf.batch_penalty(population, instance)[0]
+        order = penalty_points.argsort()
+        population, penalty_points = population[order], penalty_points[order]
+        population, penalty_points, _ = \
+            ga.reproduction(max_generations, population, penalty_points, instance, verbose=False)
+        ga_time = timer() - start
+
+        temperature = penalty_points[population_size - 1] - penalty_points[0]
+        candidate = sc.create_schedule(population[0], instance.availability.shape[0])
+        start = timer()
+        _, best_penalty_point, plot_data = \
+            sa.anneal_kernel(temperature, candidate, penalty_points[0], seed + repeat, instance)
+        sa_time = timer() - start
+
+        if repeat == 0:  # includes compilation
+            first_call = ga_time + sa_time
+            continue
+
+        ga_times.append(ga_time)
+        sa_times.append(sa_time)
+        sa_moves.append(len(plot_data) / sa_time)
+        reached = np.nonzero(plot_data <= target_penalty_point)[0]
+        target_times.append(ga_time + sa_time * (reached[0] + 1) / len(plot_data) if len(reached) else None)
+
+    reached_times = [target_time for target_time in target_times if target_time is not None]
+    return [
+        {"name": "genetic algorithm", "unit": "generations/s", "first_call": first_call,
+         "mean_time": np.mean(ga_times), "std_time": np.std(ga_times),
+         "mean_rate": np.mean(max_generations / np.array(ga_times)),
+         "std_rate": np.std(max_generations / np.array(ga_times))},
+        {"name": "simulated annealing", "unit": "moves/s", "first_call": None,
+         "mean_time": np.mean(sa_times), "std_time": np.std(sa_times),
+         "mean_rate": np.mean(sa_moves), "std_rate": np.std(sa_moves)},
+        {"name": f"time to penalty <= {target_penalty_point} "
+                 f"({len(reached_times)}/{len(target_times)} runs)", "unit": "", "first_call": None,
+         "mean_time": np.mean(reached_times) if reached_times else float("nan"),
+         "std_time": np.std(reached_times) if reached_times else float("nan"),
+         "mean_rate": float("nan"), "std_rate": float("nan")},
+    ]
+
+
+# steps of a cold start timed in a new interpreter, each step prints its time in seconds
+cold_start_script = """
+import json, sys
+from timeit import default_timer as timer
+times = {}
+start = timer()
+import data as dt
+times["import data"] = timer() - start
+start = timer()
+import hybrid_system
+times["import hybrid_system"] = timer() - start
+import precompile as pr
+start = timer()
+dt.load(sys.argv[1])
+times["load instance"] = timer() - start
+start = timer()
+pr.precompile()
+times["precompile"] = timer() - start
+print(json.dumps(times))
+"""
+
+
+# cold starts of new interpreters (as in short runs and new worker processes)
+# the first call of each step includes writing caches of preprocessed instances and compiled functions if they are
+# missing, later calls read them
+def cold_start_benchmarks(directory, repeats):
+    runs = []
+
+    for repeat in range(repeats + 1):
+        output = subprocess.run([sys.executable, "-c", cold_start_script, directory], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+
+    return [{"name": step, "unit": "", "first_call": runs[0][step],
+             "mean_time": np.mean([run[step] for run in runs[1:]]), "std_time": np.std([run[step] for run in runs[1:]]),
+             "mean_rate": float("nan"), "std_rate": float("nan")} for step in runs[0]]
+
+
+# print benchmark results as a table
+def report(title, results):
+    table = PrettyTable()
+    table.title = title
+    table.field_names = ["Benchmark", "First Call (s)", "Time (s)", "Throughput"]
+
+    for result in results:
+        first_call = "" if result["first_call"] is None else f"{result['first_call']:.3f}"
+        throughput = "" if np.isnan(result["mean_rate"]) else \
+            f"{result['mean_rate']:,.0f} ± {result['std_rate']:,.0f} {result['unit']}"
+        table.add_row([result["name"], first_call, f"{result['mean_time']:.4f} ± {result['std_time']:.4f}",
+                       throughput])
+
+    print(table)
+
+
+# run benchmarks on bundled input files and larger synthetic instances
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark penalty function, operators and hybrid system")
+    parser.add_argument("--repeats", type=int, default=5, help="timed repeats of each benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first repeat")
+    parser.add_argument("--target", type=int, default=500, help="target penalty points of time to target")
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[500, 1000],
+                        help="no. of presentations of synthetic instances")
+    parser.add_argument("--skip-end-to-end", action="store_true", help="run micro-benchmarks only")
+    parser.add_argument("--skip-cold-start", action="store_true", help="skip benchmarks of cold starts")
+    arguments = parser.parse_args()
+
+    if not arguments.skip_cold_start:
+        report("Cold start: input_files", cold_start_benchmarks(input_directory, arguments.repeats))
+
+    instances = [("input_files", dt.load(input_directory))]
+
+    for presentation_no in arguments.synthetic:
+        # enough slots and supervisors to keep density similar to bundled input files
+        with tempfile.TemporaryDirectory() as directory:
+            ig.generate(directory, presentation_no, seed=arguments.seed)
+            instances.append((f"synthetic ({presentation_no} presentations)", dt.load(directory)))
+
+    for name, instance in instances:
+        report(f"Micro-benchmarks: {name}", micro_benchmarks(instance, arguments.repeats, arguments.seed))
+
+        if not arguments.skip_end_to_end:
+            report(f"End-to-end: {name}",
+                   end_to_end_benchmarks(instance, arguments.repeats, arguments.seed, arguments.target))
+
+
+if __name__ == "__main__":
+    main()
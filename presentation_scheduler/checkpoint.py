@@ -0,0 +1,52 @@
+import schedule as sc
+import numpy as np
+import os
+
+
+# write a state (dictionary of arrays) to a binary .npz file
+# the file is written next to the checkpoint and then renamed, hence an interrupted write never replaces it
+# (each process writes its own file, hence processes writing the same path never write into each other's file)
+def save(path, state):
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(temporary_path, 'wb') as file:
+        np.savez(file, **state)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary_path, path)
+
+
+# read a state written by save
+def load(path):
+    with np.load(path) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+# arrays of a list of schedules, each field is stacked and prefixed
+# the whole free-slot index is kept because random slots are sampled from its order
+def schedule_arrays(prefix, schedules):
+    return {f"{prefix}_{field}": np.stack([getattr(schedule, field) for schedule in schedules])
+            for field in sc.Schedule._fields}
+
+
+# list of schedules stored by schedule_arrays
+def schedules_of(prefix, state):
+    schedule_no = len(state[f"{prefix}_presentation_slot"])
+    return [sc.Schedule(*(np.copy(state[f"{prefix}_{field}"][i]) for field in sc.Schedule._fields))
+            for i in range(schedule_no)]
+
+
+# arrays of the state of a NumPy random generator
+def random_state_arrays(random_state):
+    _, keys, position, has_gauss, cached_gaussian = random_state.get_state()
+    return {"random_keys": keys, "random_position": np.array(position),
+            "random_gaussian": np.array([has_gauss, cached_gaussian])}
+
+
+# NumPy random generator restored from arrays stored by random_state_arrays
+def random_state_of(state):
+    random_state = np.random.RandomState()
+    random_state.set_state(("MT19937", state["random_keys"], int(state["random_position"]),
+                            int(state["random_gaussian"][0]), float(state["random_gaussian"][1])))
+    return random_state
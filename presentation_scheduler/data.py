@@ -1,177 +1,405 @@
+import checkpoint as ck
 import csv
+import hashlib
+import os
 import numpy as np
-import matplotlib.pyplot as plt
-from prettytable import PrettyTable
+import json
+import threading
+from collections import namedtuple
 from datetime import datetime as date
 
+# static data of a problem instance shared by all operators and the penalty function
+# compressed sparse rows (CSR): indices of row i are stored in values[offsets[i]:offsets[i + 1]]
+Instance = namedtuple("Instance", [
+    "availability",  # slot × presentation mask of slots each presentation can be scheduled on
+    "presentation_supervisor",
+    "supervisor_preference",
+    "feasible_slots", "feasible_offsets",  # CSR of available slots of each presentation
+    "supervisor_presentations", "supervisor_offsets",  # CSR of presentations of each supervisor
+    "presentation_supervisors", "presentation_offsets",  # CSR of supervisors of each presentation
+    "presentation_neighbours", "neighbour_offsets",  # CSR of presentations sharing a supervisor
+    "slot_day", "slot_time", "slot_venue",  # day, time slot and venue of each slot
+    "slot_group",  # group of concurrent slots (same day and time slot) of each slot
+    "concurrent_slots",  # group × venue matrix of concurrent slots
+    "open_slots",  # slots which are available for at least 1 presentation
+    "venue_no", "time_slot_no", "day_no"
+])
+
+
+# venues, days and time slots of a timetable, each slot is a combination of a day, a venue and a time slot
+Timetable = namedtuple("Timetable", ["venues", "days", "time_slots"])
+default_timetable = Timetable(venues=["Viva Room", "Meeting Room", "Interaction Room", "BJIM"],
+                              days=["Mon", "Tues", "Wed", "Thu", "Fri"],
+                              time_slots=["0900-0930", "0930-1000", "1000-1030",
+                                          "1030-1100", "1100-1130", "1130-1200",
+                                          "1200-1230", "1230-1300", "1400-1430",
+                                          "1430-1500", "1500-1530", "1530-1600",
+                                          "1600-1630", "1630-1700", "1700-1730"])
+
+# input files of a problem instance, a preprocessed instance is cached under the hash of their contents
+# instance_format is part of the hash, hence it is incremented whenever Instance or its preprocessing changes
+instance_files = ['SupExaAssign.csv', 'HC03.csv', 'HC04.csv', 'SC01.csv', 'SC02.csv', 'SC03.csv', 'Timetable.csv']
+instance_format = 2
+
+
+# read non-empty rows of a csv file in a directory
+def read_csv(directory, filename, has_header=False):
+    with open(os.path.join(directory, filename)) as file:
+        csv_reader = csv.reader(file, delimiter=',')
+
+        if has_header:
+            next(csv_reader)
+
+        return [row for row in csv_reader if row]
+
+
+# index of a presentation (P___) or a supervisor (S___) starting from 0
+def code_index(code):
+    return int(code[1:]) - 1
+
+
+# read Timetable.csv (venues, days and time slots), default timetable is used if the file does not exist
+def load_timetable(directory="input_files"):
+    if not os.path.exists(os.path.join(directory, 'Timetable.csv')):
+        return default_timetable
+
+    labels = {row[0]: [label for label in row[1:] if label] for row in read_csv(directory, 'Timetable.csv')}
+    return Timetable(labels["Venue"], labels["Day"], labels["Time Slot"])
+
+
+# content hash of the input files of a problem instance in a directory
+def content_hash(directory="input_files"):
+    content = hashlib.sha256(f"instance format {instance_format}".encode())
+
+    for filename in instance_files:
+        path = os.path.join(directory, filename)
+        content.update(filename.encode())
+
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                content.update(file.read())
+        else:
+            content.update(b"missing")
+
+    return content.hexdigest()
+
+
+# path of the preprocessed instance of the input files in a directory
+# the cache directory defaults to .instance_cache in the input directory
+def instance_path(directory="input_files", cache_directory=None):
+    if cache_directory is None:
+        cache_directory = os.path.join(directory, ".instance_cache")
 
-#  load data from csv files
-def load():
-    slot_no = 300
-    supervisor_no = 47
-    presentation_no = 118
+    return os.path.join(cache_directory, f"instance {content_hash(directory)[:16]}.npz")
+
+
+# write a preprocessed instance to a binary .npz file
+def save_instance(path, instance):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ck.save(path, {name: np.asarray(value) for name, value in instance._asdict().items()})
+
+
+# read a preprocessed instance written by save_instance
+def read_instance(path):
+    state = ck.load(path)
+    return Instance(**{name: int(state[name]) if state[name].ndim == 0 else state[name] for name in Instance._fields})
+
+
+#  load a problem instance from csv files in a directory
+#  the preprocessed instance is read from the cache if the input files have not changed since it was written,
+#  otherwise it is built from the csv files and written to the cache (a cache which cannot be written is skipped)
+def load(directory="input_files", use_cache=True, cache_directory=None):
+    if not use_cache:
+        return parse(directory)
+
+    path = instance_path(directory, cache_directory)
+
+    if os.path.exists(path):
+        return read_instance(path)
+
+    instance = parse(directory)
+
+    try:
+        save_instance(path, instance)
+    except OSError:
+        pass
+
+    return instance
+
+
+#  build a problem instance from csv files in a directory
+#  no. of presentations and supervisors are derived from the input files, no. of slots from the timetable
+def parse(directory="input_files"):
+    timetable = load_timetable(directory)
+    venue_no = len(timetable.venues)
+    time_slot_no = len(timetable.time_slots)
+    day_no = len(timetable.days)
+    slot_no = venue_no * time_slot_no * day_no
     preference_no = 3
+
+    supervisor_assignments = read_csv(directory, 'SupExaAssign.csv', has_header=True)
+    venue_unavailability = read_csv(directory, 'HC03.csv')
+    staff_unavailability = read_csv(directory, 'HC04.csv')
+    consecutive_preferences = read_csv(directory, 'SC01.csv')
+    day_preferences = read_csv(directory, 'SC02.csv')
+    venue_preferences = read_csv(directory, 'SC03.csv')
+
+    presentation_no = max(code_index(row[0]) for row in supervisor_assignments) + 1
+    supervisor_no = max(code_index(code) for row in supervisor_assignments for code in row[1:] if code)
+    supervisor_no = max([supervisor_no] + [code_index(row[0]) for rows in (staff_unavailability,
+                                                                           consecutive_preferences, day_preferences,
+                                                                           venue_preferences) for row in rows]) + 1
     presentation_supervisor = np.zeros([presentation_no, supervisor_no], dtype=np.int8)
-    supervisor_slot = np.zeros([supervisor_no, slot_no], dtype=np.int8)
-    supervisor_preference = np.zeros([supervisor_no, 2 * preference_no], dtype=np.int8)
+    availability = np.ones([slot_no, presentation_no], dtype=bool)
+    supervisor_preference = np.zeros([supervisor_no, preference_no], dtype=np.int32)
 
     # read supExaAssign.csv
-    with open('input_files\SupExaAssign.csv') as file:
-        csv_reader = csv.reader(file, delimiter=',')
-        next(csv_reader)
-
-        for row in csv_reader:
-            i = int(row[0][1:]) - 1  # only underscores in P___ will be considered
+    for row in supervisor_assignments:
+        i = code_index(row[0])
 
-            for col in range(1, 4):
-                j = int(row[col][2:]) - 1  # only underscores in S0__ will be considered
-                presentation_supervisor[i][j] = 1
+        for code in row[1:]:
+            if code:
+                presentation_supervisor[i][code_index(code)] = 1
 
-    presentation_presentation = np.dot(presentation_supervisor, presentation_supervisor.transpose())
-    # presentations supervised by same examiners are marked with 1
-    presentation_presentation[presentation_presentation >= 1] = 1
-    np.fill_diagonal(presentation_presentation, 0)  # mark diagonal with 0 so penalty points can be calculated correctly
+    supervisor_presentations, supervisor_offsets = sparse_rows(presentation_supervisor.transpose())
 
     # read HC04.csv (staff unavailability)
-    with open('input_files\HC04.csv') as file:
-        csv_reader = csv.reader(file, delimiter=',')
-
-        for row in csv_reader:
-            i = int(row[0][2:]) - 1  # only underscores in S0__ will be considered
-            j = [int(_) - 1 for _ in row[1:]]
-            supervisor_slot[i][j] = 1
-
-    slot_presentation = np.dot(supervisor_slot.transpose(), presentation_supervisor.transpose())
-    slot_presentation[slot_presentation >= 1] = -1  # unavailable slots for presentation are marked with -1
+    # slots are unavailable for presentations of supervisors who are unavailable
+    for row in staff_unavailability:
+        i = code_index(row[0])
+        j = [int(_) - 1 for _ in row[1:] if _]
+        availability[np.ix_(j, supervisor_presentations[supervisor_offsets[i]:supervisor_offsets[i + 1]])] = False
 
     # read HC03.csv (venue unavailability)
-    with open('input_files\HC03.csv') as file:
-        csv_reader = csv.reader(file, delimiter=',')
-
-        for row in csv_reader:
-            i = [int(_) - 1 for _ in row[1:]]
-            slot_presentation[i, :] = -1  # unavailable slots for presentation are marked with -1
+    for row in venue_unavailability:
+        i = [int(_) - 1 for _ in row[1:] if _]
+        availability[i, :] = False  # unavailable slots for all presentations
 
     # read SC01.csv (consecutive presentations)
-    with open('input_files\SC01.csv') as file:
-        csv_reader = csv.reader(file, delimiter=',')
-
-        for row in csv_reader:
-            i = int(row[0][2:]) - 1  # only underscores in S0__ will be considered
-            supervisor_preference[i][0] = int(row[1])
+    for row in consecutive_preferences:
+        supervisor_preference[code_index(row[0])][0] = int(row[1])
 
     # read SC02.csv (number of days)
-    with open('input_files\SC02.csv') as file:
-        csv_reader = csv.reader(file, delimiter=',')
-
-        for row in csv_reader:
-            i = int(row[0][2:]) - 1  # only underscores in S0__ will be considered
-            supervisor_preference[i][1] = int(row[1])
+    for row in day_preferences:
+        supervisor_preference[code_index(row[0])][1] = int(row[1])
 
     # read SC03.csv (change of venue)
-    with open('input_files\SC03.csv') as file:
-        csv_reader = csv.reader(file, delimiter=',')
+    for row in venue_preferences:
+        supervisor_preference[code_index(row[0])][2] = 1 if row[1] == "yes" else 0
 
-        for row in csv_reader:
-            i = int(row[0][2:]) - 1  # only underscores in S0__ will be considered
-            supervisor_preference[i][2] = 1 if row[1] == "yes" else 0
+    return build_instance(availability, presentation_supervisor, supervisor_preference, venue_no, time_slot_no, day_no)
 
-    return slot_presentation, presentation_presentation, presentation_supervisor, supervisor_preference
 
+# compressed sparse rows of the column indices of non-zero elements in each row of a matrix
+def sparse_rows(matrix):
+    offsets = np.zeros(matrix.shape[0] + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum(np.count_nonzero(matrix, axis=1))
+    values = np.nonzero(matrix)[1].astype(np.int16)  # column indices are grouped by row
+    return values, offsets
 
-# write result to csv file with timestamp
-def write(slot_presentation, supervisor_preference, constraints_count, plot_data):
-    timestamp = date.now().strftime("[%Y-%m-%d %H-%M-%S]")
 
-    # plot graph
-    title = (f"Improvement of Presentation Scheduling over Iterations\n"
-             f"[Hard Constraints Violated:] {constraints_count[1]} "
-             f"[Soft Constraints Violated:] {constraints_count[2]}\n"
-             f"[Final Penalty Points:] {constraints_count[0]}")
-    plt.title(title)
-    plt.xlabel("Number of Iterations")
-    plt.ylabel("Penalty Points")
-    plt.axis([0, len(plot_data), 0, max(plot_data)])
-    plt.plot(plot_data, "r--")
-    plt.grid(True)
-    plt.ioff()
-    plt.show()
-    graph_name = f"graph {timestamp}"
-    plt.savefig(graph_name)
+# compressed sparse rows of presentations sharing a supervisor with each presentation (in ascending order)
+# pairs are only generated within the presentations of each supervisor instead of a presentation × presentation
+# matrix, hence the cost grows with the no. of pairs rather than quadratically with the no. of presentations
+def neighbour_rows(supervisor_presentations, supervisor_offsets, presentation_no):
+    firsts = [np.empty(0, dtype=np.int64)]
+    seconds = [np.empty(0, dtype=np.int64)]
 
-    # draw schedule
-    venue_no = 4
-    time_slot_no = 15
-    day_slot_no = venue_no * time_slot_no
-    day_no = 5
-    slot_no = day_slot_no * day_no
-    venues = ["Viva Room", "Meeting Room", "Interaction Room", "BJIM"]
-    days = ["Mon", "Tues", "Wed", "Thu", "Fri"]
+    for supervisor in range(len(supervisor_offsets) - 1):
+        presentations = supervisor_presentations[supervisor_offsets[supervisor]:supervisor_offsets[supervisor + 1]]
+        firsts.append(np.repeat(presentations.astype(np.int64), len(presentations)))
+        seconds.append(np.tile(presentations.astype(np.int64), len(presentations)))
 
-    schedule = PrettyTable()
-    schedule.field_names = ["Day", "Venue",
-                            "0900-0930", "0930-1000", "1000-1030",
-                            "1030-1100", "1100-1130", "1130-1200",
-                            "1200-1230", "1230-1300", "1400-1430",
-                            "1430-1500", "1500-1530", "1530-1600",
-                            "1600-1630", "1630-1700", "1700-1730"]
+    firsts, seconds = np.divmod(np.unique(np.concatenate(firsts) * presentation_no + np.concatenate(seconds)),
+                                presentation_no)
+    neighbours = firsts != seconds
+    offsets = np.zeros(presentation_no + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum(np.bincount(firsts[neighbours], minlength=presentation_no))
+    return seconds[neighbours].astype(np.int16), offsets
 
-    venue = 0
-    day = 0
 
-    for first_slot in range(0, slot_no, time_slot_no):
-        row = []
+# check that a problem instance fits the types of its indexes: slots, presentations and supervisors are stored as int16
+# and venues (plus 1) in the int8 day-by-time-slot matrices of the penalty function
+def check_size(slot_no, presentation_no, supervisor_no, venue_no):
+    for name, number in (("slots", slot_no), ("presentations", presentation_no), ("supervisors", supervisor_no)):
+        if number > np.iinfo(np.int16).max:
+            raise ValueError(f"{number} {name} exceed the limit of {np.iinfo(np.int16).max}")
+
+    if venue_no >= np.iinfo(np.int8).max:
+        raise ValueError(f"{venue_no} venues exceed the limit of {np.iinfo(np.int8).max - 1}")
 
-        if venue == 0:
-            row.append(days[day])
-        else:
-            row.append("")
 
-        row.append(venues[venue])
+# precompute indexes of a problem instance once so that operators never rescan static matrices
+def build_instance(availability, presentation_supervisor, supervisor_preference, venue_no, time_slot_no, day_no):
+    check_size(availability.shape[0], availability.shape[1], presentation_supervisor.shape[1], venue_no)
+    day_slot_no = venue_no * time_slot_no
+    slots = np.arange(availability.shape[0], dtype=np.int16)
+    slot_day = slots // day_slot_no
+    slot_time = slots % time_slot_no
+    slot_venue = (slots // time_slot_no) % venue_no
+    slot_group = slot_day * time_slot_no + slot_time
+    concurrent_slots = np.empty((day_no * time_slot_no, venue_no), dtype=np.int16)
+    concurrent_slots[slot_group, slot_venue] = slots
+    supervisor_presentations, supervisor_offsets = sparse_rows(presentation_supervisor.transpose())
+
+    return Instance(availability, presentation_supervisor, supervisor_preference,
+                    *sparse_rows(availability.transpose()),
+                    supervisor_presentations, supervisor_offsets,
+                    *sparse_rows(presentation_supervisor),
+                    *neighbour_rows(supervisor_presentations, supervisor_offsets, availability.shape[1]),
+                    slot_day, slot_time, slot_venue, slot_group, concurrent_slots, np.any(availability, axis=1),
+                    venue_no, time_slot_no, day_no)
+
+
+# keep at most max_points of a convergence trace (best penalty points after each iteration)
+# the minimum of each bucket of iterations is kept so that improvements are never lost from the plot
+# returns the last iteration of each bucket and its penalty points
+def downsample(plot_data, max_points=2000):
+    plot_data = np.asarray(plot_data, dtype=np.int64)
+
+    if len(plot_data) <= max_points:
+        return np.arange(1, len(plot_data) + 1), plot_data
+
+    bounds = np.linspace(0, len(plot_data), max_points + 1).astype(np.int64)
+    return bounds[1:], np.minimum.reduceat(plot_data, bounds[:-1])
+
+
+# plot convergence trace on the axes of a figure
+def plot_convergence(axes, constraints_count, iterations, penalty_points):
+    axes.set_title(f"Improvement of Presentation Scheduling over Iterations\n"
+                   f"[Hard Constraints Violated:] {constraints_count[1]} "
+                   f"[Soft Constraints Violated:] {constraints_count[2]}\n"
+                   f"[Final Penalty Points:] {constraints_count[0]}")
+    axes.set_xlabel("Number of Iterations")
+    axes.set_ylabel("Penalty Points")
+    axes.axis([0, iterations[-1] if len(iterations) else 1, 0, max(penalty_points.max(initial=0), 1)])
+    axes.plot(iterations, penalty_points, "r--")
+    axes.grid(True)
+
+
+# draw schedule as a table of days and venues by time slots
+def schedule_table(slot_occupancy, timetable):
+    from prettytable import PrettyTable  # output dependencies are only imported when results are written
+
+    venue_no = len(timetable.venues)
+    time_slot_no = len(timetable.time_slots)
+    schedule = PrettyTable()
+    schedule.field_names = ["Day", "Venue"] + list(timetable.time_slots)
 
-        for slot in range(first_slot, first_slot + time_slot_no):
-            presentation = np.where(slot_presentation[slot] == 1)[0]
+    for first_slot in range(0, len(slot_occupancy), time_slot_no):
+        day, venue = divmod(first_slot // time_slot_no, venue_no)
+        row = [timetable.days[day] if venue == 0 else "", timetable.venues[venue]]
 
-            if len(presentation) == 0:
-                row.append("")
-            else:
-                presentation = presentation[0] + 1
-                row.append("P" + str(presentation))
+        for presentation in slot_occupancy[first_slot:first_slot + time_slot_no]:
+            row.append("" if presentation == -1 else "P" + str(presentation + 1))
 
         schedule.add_row(row)
-        venue += 1
 
-        if venue == venue_no:
-            venue = 0
-            day += 1
+        if venue == venue_no - 1:
             schedule.add_row([""] * (2 + time_slot_no))
 
-    print("\n", schedule, "\n")
+    return schedule
 
-    # print supervisor-related data
-    supervisor_no = supervisor_preference.shape[0]
 
-    for supervisor in range(supervisor_no):
-        venue_preference = "No" if supervisor_preference[supervisor][2] else "Yes"
+# header and rows of code, preferences and statistics of each supervisor
+supervisor_header = ["Supervisor", "Consecutive Preference", "Consecutive Violations", "Day Preference", "Days",
+                     "Venue Change Preference", "Venue Changes"]
+
+
+def supervisor_rows(supervisor_preference, supervisor_statistics):
+    return [[f"S{str(supervisor + 1).zfill(3)}", preference[0], consecutive_violations, preference[1], day_count,
+             "No" if preference[2] else "Yes", venue_changes]
+            for supervisor, (preference, consecutive_violations, day_count, venue_changes)
+            in enumerate(zip(supervisor_preference, *supervisor_statistics))]
+
+
+# write schedule to a csv file (presentation or null for each slot) or a json file (presentation, day, venue and
+# time slot of each scheduled presentation)
+def write_schedule(filename, slot_occupancy, constraints_count, timetable, result_format="csv"):
+    if result_format == "csv":
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+
+            for presentation in slot_occupancy:
+                # empty if no presentation is found for the slot
+                writer.writerow(["null" if presentation == -1 else "P" + str(presentation + 1), ""])
+    elif result_format == "json":
+        venue_no = len(timetable.venues)
+        time_slot_no = len(timetable.time_slots)
+        presentations = []
 
-        print(f"[Supervisor S{str(supervisor + 1).zfill(3)}] "
-              f"[No. of Continuous Presentations: {supervisor_preference[supervisor][3]}] "
-              f"[Day Preference: {supervisor_preference[supervisor][1]}] "
-              f"[Days: {supervisor_preference[supervisor][4]}] "
-              f"[Venue Change Preference: {venue_preference}] "
-              f"[Venue Changes: {supervisor_preference[supervisor][5]}]")
+        for slot in np.nonzero(slot_occupancy != -1)[0]:
+            day, venue = divmod(int(slot) // time_slot_no, venue_no)
+            presentations.append({"presentation": "P" + str(slot_occupancy[slot] + 1), "slot": int(slot) + 1,
+                                  "day": timetable.days[day], "venue": timetable.venues[venue],
+                                  "time_slot": timetable.time_slots[slot % time_slot_no]})
 
-    # write result data to csv file with timestamp
-    filename = f"result {timestamp}.csv"
+        with open(filename, 'w') as file:
+            json.dump({"penalty_point": int(constraints_count[0]), "hard_constraints": int(constraints_count[1]),
+                       "soft_constraints": int(constraints_count[2]), "schedule": presentations}, file, indent=1)
+    else:
+        raise ValueError(f"Unknown result format: {result_format}")
 
-    with open(filename, 'w', newline='') as file:
+
+# write result data (schedule, supervisor statistics and convergence graph) into a directory
+# returns the paths of the written files
+def write_files(slot_occupancy, supervisor_preference, supervisor_statistics, constraints_count, iterations,
+                penalty_points, timetable, directory, timestamp, result_format):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    os.makedirs(directory, exist_ok=True)
+    result_name = os.path.join(directory, f"result {timestamp}.{result_format}")
+    statistics_name = os.path.join(directory, f"supervisors {timestamp}.csv")
+    graph_name = os.path.join(directory, f"graph {timestamp}.png")
+    write_schedule(result_name, slot_occupancy, constraints_count, timetable, result_format)
+
+    with open(statistics_name, 'w', newline='') as file:
         writer = csv.writer(file)
+        writer.writerow(supervisor_header)
+        writer.writerows(supervisor_rows(supervisor_preference, supervisor_statistics))
+
+    # figure without pyplot does not depend on a display and can be drawn on any thread
+    figure = Figure(tight_layout=True)
+    FigureCanvasAgg(figure)
+    plot_convergence(figure.add_subplot(), constraints_count, iterations, penalty_points)
+    figure.savefig(graph_name)
+    return result_name, statistics_name, graph_name
+
+
+# write result to files with timestamp, supervisor_statistics are computed by penalty_function.supervisor_statistics
+# headless: files are written on a background thread without showing the graph or printing the schedule,
+# the returned thread can be joined to wait for the files (the program does not exit before it finishes)
+def write(candidate, supervisor_preference, supervisor_statistics, constraints_count, plot_data,
+          timetable=default_timetable, headless=False, directory=".", result_format="csv", max_points=2000):
+    timestamp = date.now().strftime("[%Y-%m-%d %H-%M-%S]")
+    iterations, penalty_points = downsample(plot_data, max_points)
 
-        for slot in range(slot_presentation.shape[0]):
-            presentation = np.where(slot_presentation[slot] == 1)[0]
+    # copy result data so that the caller can keep changing the candidate
+    arguments = (np.copy(candidate.slot_occupancy), np.copy(supervisor_preference),
+                 type(supervisor_statistics)(*(np.copy(statistic) for statistic in supervisor_statistics)),
+                 tuple(constraints_count), iterations, penalty_points, timetable, directory, timestamp, result_format)
 
-            if len(presentation) == 0:  # empty if no presentation is found for the slot
-                writer.writerow(["null", ""])
-            else:
-                presentation = presentation[0] + 1  # Access x in array([x])
-                writer.writerow(["P" + str(presentation), ""])
+    if headless:
+        thread = threading.Thread(target=write_files, args=arguments, name="result writer")
+        thread.start()
+        return thread
+
+    write_files(*arguments)
+    print("\n", schedule_table(candidate.slot_occupancy, timetable), "\n")
+
+    # print supervisor-related data
+    for row in supervisor_rows(supervisor_preference, supervisor_statistics):
+        print(f"[Supervisor {row[0]}] "
+              f"[No. of Continuous Presentations: {row[2]}] "
+              f"[Day Preference: {row[3]}] "
+              f"[Days: {row[4]}] "
+              f"[Venue Change Preference: {row[5]}] "
+              f"[Venue Changes: {row[6]}]")
+
+    # show graph after it has been saved
+    import matplotlib.pyplot as plt
+
+    plot_convergence(plt.figure(tight_layout=True).add_subplot(), constraints_count, iterations, penalty_points)
+    plt.show()
+    return None
@@ -1,137 +1,357 @@
-from penalty_function import penalty
+from penalty_function import penalty, batch_penalty
+import schedule as sc
+import telemetry as tm
+import penalty_cache as pc
+import population as po
+import termination as tn
 import numpy as np
+from numba import njit
 
 
 # generate initial population where all hard constraints have been solved except HC02
-def generate_chromosome(slot_presentation):
-    chromosome = np.copy(slot_presentation)
-    slot_no = chromosome.shape[0]
-    presentation_no = chromosome.shape[1]
+@njit(cache=True)
+def generate_chromosome(instance, counters=None):
+    slot_no = instance.availability.shape[0]
+    presentation_no = instance.availability.shape[1]
+    chromosome = sc.empty_schedule(presentation_no, slot_no)
 
     for presentation in range(presentation_no):
-        while True:
-            random_slot = np.random.randint(slot_no)
-            # if the slot is available and empty
-            if chromosome[random_slot][presentation] == 0 and np.count_nonzero(chromosome[random_slot] == 1) == 0:
-                chromosome[random_slot][presentation] = 1
-                break
+        # a random slot which is available and empty
+        random_slot = sc.random_empty_slot(chromosome, instance, presentation, counters)
+
+        if random_slot == -1:
+            raise ValueError("No available slot is left for presentation P" + str(presentation + 1))
+
+        sc.assign(chromosome, presentation, random_slot)
+
+    return chromosome
+
+
+# cost of scheduling a presentation on a slot given the presentations scheduled so far
+# supervisor_group: venue (plus 1) of a presentation of each supervisor in each group of concurrent slots (0 if none)
+# supervisor_day: no. of presentations of each supervisor on each day, supervisor_days: no. of days of each supervisor
+@njit(cache=True)
+def slot_cost(presentation, slot, instance, supervisor_group, supervisor_day, supervisor_days):
+    group = instance.slot_group[slot]
+    day = instance.slot_day[slot]
+    time_slot = instance.slot_time[slot]
+    venue = instance.slot_venue[slot] + 1
+    cost = 0
+
+    for i in range(instance.presentation_offsets[presentation], instance.presentation_offsets[presentation + 1]):
+        supervisor = instance.presentation_supervisors[i]
+        preference = instance.supervisor_preference[supervisor]
+
+        # HC02: supervisor attends another presentation concurrently
+        if supervisor_group[supervisor][group] != 0:
+            cost += 1000
+
+        # SC02: a new day exceeds the no. of days preferred
+        if supervisor_day[supervisor][day] == 0 and supervisor_days[supervisor] >= preference[1]:
+            cost += 10
+
+        # SC01 and SC03: consecutive presentations before and after the slot
+        consecutive_count = 1
+
+        for step in (-1, 1):
+            adjacent_time_slot = time_slot + step
+
+            while 0 <= adjacent_time_slot < instance.time_slot_no and \
+                    supervisor_group[supervisor][group + adjacent_time_slot - time_slot] != 0:
+                adjacent_venue = supervisor_group[supervisor][group + adjacent_time_slot - time_slot]
+
+                if adjacent_time_slot == time_slot + step and preference[2] == 1 and adjacent_venue != venue:
+                    cost += 10
+
+                consecutive_count += 1
+                adjacent_time_slot += step
+
+        if consecutive_count > preference[0]:
+            cost += 10
+        elif consecutive_count > 1:
+            cost -= 1
+
+    return cost
+
+
+# constructive chromosome - presentations are scheduled in order of the fewest available slots per presentation
+# sharing a supervisor (most constrained first), each on a random slot among the empty available slots whose cost
+# is at most rcl_width above the cheapest slot (restricted candidate list), hence concurrent presentations of the same
+# supervisors are avoided and preferences of supervisors are followed where possible
+# order_noise randomly perturbs the order so that chromosomes are diverse
+# at most candidate_no random available slots are evaluated for each presentation (all slots if there are fewer)
+@njit(cache=True)
+def construct_chromosome(instance, rcl_width=10, order_noise=0.5, candidate_no=256):
+    slot_no = instance.availability.shape[0]
+    presentation_no = instance.availability.shape[1]
+    supervisor_no = instance.supervisor_preference.shape[0]
+    chromosome = sc.empty_schedule(presentation_no, slot_no)
+    supervisor_group = np.zeros((supervisor_no, instance.day_no * instance.time_slot_no), dtype=np.int16)
+    supervisor_day = np.zeros((supervisor_no, instance.day_no), dtype=np.int32)
+    supervisor_days = np.zeros(supervisor_no, dtype=np.int32)
+    constraint = np.empty(presentation_no)
+    candidate_slots = np.empty(candidate_no, dtype=np.int16)
+    candidate_costs = np.empty(candidate_no, dtype=np.int64)
+
+    for presentation in range(presentation_no):
+        feasible_no = instance.feasible_offsets[presentation + 1] - instance.feasible_offsets[presentation]
+        neighbour_no = instance.neighbour_offsets[presentation + 1] - instance.neighbour_offsets[presentation]
+        constraint[presentation] = feasible_no / (1 + neighbour_no) * (1 + order_noise * np.random.random())
+
+    for presentation in np.argsort(constraint):
+        first = instance.feasible_offsets[presentation]
+        feasible_no = instance.feasible_offsets[presentation + 1] - first
+        candidate_count = 0
+
+        # evaluate empty slots among all available slots, or among random available slots if there are too many
+        sampled = feasible_no > candidate_no
+
+        for i in range(candidate_no if sampled else feasible_no):
+            slot = instance.feasible_slots[first + (np.random.randint(feasible_no) if sampled else i)]
+
+            if chromosome.slot_occupancy[slot] == -1:
+                candidate_slots[candidate_count] = slot
+                candidate_costs[candidate_count] = \
+                    slot_cost(presentation, slot, instance, supervisor_group, supervisor_day, supervisor_days)
+                candidate_count += 1
+
+        # every sampled slot is occupied, hence any empty available slot is taken
+        if candidate_count == 0:
+            slot = sc.random_empty_slot(chromosome, instance, presentation)
+
+            if slot == -1:
+                raise ValueError("No available slot is left for presentation P" + str(presentation + 1))
+
+            candidate_slots[0] = slot
+            candidate_costs[0] = 0
+            candidate_count = 1
+
+        # sample uniformly from the restricted candidate list
+        minimum_cost = candidate_costs[:candidate_count].min()
+        chosen_slot = -1
+        count = 0
+
+        for i in range(candidate_count):
+            if candidate_costs[i] <= minimum_cost + rcl_width:
+                count += 1
+
+                if np.random.randint(count) == 0:
+                    chosen_slot = candidate_slots[i]
+
+        sc.assign(chromosome, presentation, chosen_slot)
+        day = instance.slot_day[chosen_slot]
+
+        for i in range(instance.presentation_offsets[presentation], instance.presentation_offsets[presentation + 1]):
+            supervisor = instance.presentation_supervisors[i]
+            supervisor_group[supervisor][instance.slot_group[chosen_slot]] = instance.slot_venue[chosen_slot] + 1
+
+            if supervisor_day[supervisor][day] == 0:
+                supervisor_days[supervisor] += 1
+
+            supervisor_day[supervisor][day] += 1
 
     return chromosome
 
 
 # select 2 chromosomes based on tournament selection
-def selection(population, penalty_points):
-    tournament_size = 2
+@njit(cache=True)
+def selection(population):
+    population_size = population.chromosomes.shape[0]
+    penalty_points = population.penalty_points
 
     # select 1st chromosome based on 1st tournament selection
-    t1, t2 = np.random.choice(range(population.shape[0]), tournament_size)
+    t1, t2 = np.random.randint(population_size), np.random.randint(population_size)
     first = t1 if penalty_points[t1] <= penalty_points[t2] else t2
 
     # ensure 2 chromosomes selected are not identical
     while True:
         # select 2nd chromosome based on 2nd tournament selection
-        t1, t2 = np.random.choice(range(population.shape[0]), tournament_size)
+        t1, t2 = np.random.randint(population_size), np.random.randint(population_size)
         second = t1 if penalty_points[t1] <= penalty_points[t2] else t2
 
         if second != first:
             break
 
-    return population[first], population[second]
+    return population.chromosomes[first], population.chromosomes[second]
 
 
 # perform 2-point crossover
-def crossover(first_parent, second_parent):
-    first_child = np.copy(first_parent)
-    second_child = np.copy(second_parent)
-    presentation_no = first_parent.shape[1]
-    cutpoint1, cutpoint2 = np.random.choice(range(presentation_no), 2)
+@njit(cache=True)
+def crossover(first_parent, second_parent, instance, counters=None):
+    presentation_no = first_parent.shape[0]
+    cutpoint1, cutpoint2 = np.random.randint(presentation_no), np.random.randint(presentation_no)
 
     if cutpoint1 > cutpoint2:
         cutpoint1, cutpoint2 = cutpoint2, cutpoint1
 
     # swap presentations from cutpoint1 to cutpoint2 between 2 parents
-    first_child[:, cutpoint1:cutpoint2], second_child[:, cutpoint1:cutpoint2] = \
-        second_child[:, cutpoint1:cutpoint2], np.copy(first_child[:, cutpoint1:cutpoint2])
-    first_child = repair(first_child, cutpoint1, cutpoint2)
-    second_child = repair(second_child, cutpoint1, cutpoint2)
+    first_child = repair(first_parent, second_parent, cutpoint1, cutpoint2, instance, counters)
+    second_child = repair(second_parent, first_parent, cutpoint1, cutpoint2, instance, counters)
     return first_child, second_child
 
 
-# repair chromosome after crossover
-def repair(chromosome, cutpoint1, cutpoint2):
-    slot_no = chromosome.shape[0]
+# repair child after crossover, presentations from cutpoint1 to cutpoint2 come from the other parent
+@njit(cache=True)
+def repair(parent, other_parent, cutpoint1, cutpoint2, instance, counters=None):
+    slot_no = instance.availability.shape[0]
+    presentation_no = parent.shape[0]
+    chromosome = sc.empty_schedule(presentation_no, slot_no)
+
+    # presentations outside the cutpoints come from the same parent, hence they never share a slot
+    for presentation in range(presentation_no):
+        if presentation < cutpoint1 or presentation >= cutpoint2:
+            sc.assign(chromosome, presentation, parent[presentation])
 
     for presentation in range(cutpoint1, cutpoint2):
-        slot = np.where(chromosome[:, presentation] == 1)[0][0]
+        slot = other_parent[presentation]
 
         # more than 1 presentation scheduled for a slot
-        if np.count_nonzero(chromosome[slot] == 1) > 1:
-            chromosome[slot][presentation] = 0
-
+        if chromosome.slot_occupancy[slot] != -1:
             # schedule presentation for another random slot
-            while True:
-                random_slot = np.random.randint(slot_no)
+            slot = sc.random_empty_slot(chromosome, instance, presentation, counters)
+
+            if counters is not None:
+                counters[tm.repair_retries] += 1
+
+            if slot == -1:
+                raise ValueError("No available slot is left for presentation P" + str(presentation + 1))
 
-                if chromosome[random_slot][presentation] == 0 and np.count_nonzero(chromosome[random_slot] == 1) == 0:
-                    chromosome[random_slot][presentation] = 1
-                    break
+        sc.assign(chromosome, presentation, slot)
 
     return chromosome
 
 
 # swap mutation of chromosome after crossover
-def mutation(chromosome):
-    presentation_no = chromosome.shape[1]
+@njit(cache=True)
+def mutation(chromosome, instance, counters=None):
+    availability = instance.availability
+    presentation_no = chromosome.presentation_slot.shape[0]
     random_presentation1 = np.random.randint(presentation_no)
-    slot1 = np.where(chromosome[:, random_presentation1] == 1)[0][0]
+    slot1 = chromosome.presentation_slot[random_presentation1]
 
     while True:
         random_presentation2 = np.random.randint(presentation_no)
-        slot2 = np.where(chromosome[:, random_presentation2] == 1)[0][0]
+        slot2 = chromosome.presentation_slot[random_presentation2]
 
         # 2 presentations can be scheduled on slots to be exchanged, hence swap 2 presentations
-        if chromosome[slot1][random_presentation2] == 0 and chromosome[slot2][random_presentation1] == 0:
-            chromosome[slot1][random_presentation1] = chromosome[slot2][random_presentation2] = 0
-            chromosome[slot1][random_presentation2] = chromosome[slot2][random_presentation1] = 1
+        if random_presentation2 != random_presentation1 and \
+                availability[slot1][random_presentation2] and availability[slot2][random_presentation1]:
+            sc.swap(chromosome, random_presentation1, random_presentation2)
             break
 
+        if counters is not None:
+            counters[tm.mutation_spins] += 1
+
     return chromosome
 
 
-# Steady-State Genetic Algorithm - replace 2 chromosomes in population
-def replacement(population, penalty_points, first_child, second_child, first_penalty_point, second_penalty_point):
-    # replace 2 chromosomes of highest penalty points with 2 new chromosomes
-    population_size = len(population)
-    population[population_size - 1], population[population_size - 2] = first_child, second_child
-    penalty_points[population_size - 1], penalty_points[population_size - 2] = first_penalty_point, second_penalty_point
+# Steady-State Genetic Algorithm - replace chromosomes of highest penalty points with 2 new chromosomes
+# a child is discarded if it is worse than the chromosome it would replace or already in the population
+@njit(cache=True)
+def replacement(population, first_child, second_child, first_penalty_point, second_penalty_point):
+    po.insert(population, first_child, first_penalty_point)
+    po.insert(population, second_child, second_penalty_point)
+
+
+# penalty points of a child, children already in the penalty cache (if it is given) are not evaluated again
+# (hence they are not counted as evaluations)
+@njit(cache=True)
+def evaluate(child, instance, counters=None, cache=None):
+    key = np.uint64(0)
+
+    if cache is not None:
+        key = pc.fingerprint(child)
+        penalty_point = pc.lookup(cache, key)
+
+        if penalty_point != -1:
+            return penalty_point
+
+    if counters is not None:
+        counters[tm.evaluations] += 1
+
+    penalty_point = penalty(child, instance)[0]
+
+    if cache is not None:
+        pc.store(cache, key, penalty_point)
+
+    return penalty_point
 
-    # sort population based on penalty points
-    population = population[penalty_points.argsort()]
-    penalty_points = penalty_points[penalty_points.argsort()]
 
-    return population, penalty_points
+# 2 children of 2 parents selected from the population after crossover and mutation
+@njit(cache=True)
+def offspring(population, instance, counters=None):
+    first_parent, second_parent = selection(population)
+    first_child, second_child = crossover(first_parent, second_parent, instance, counters)
+    first_child = mutation(first_child, instance, counters).presentation_slot
+    second_child = mutation(second_child, instance, counters).presentation_slot
+    return first_child, second_child
+
+
+# run generations of the genetic algorithm, best penalty points after each generation are stored in plot_data
+@njit(cache=True)
+def generations(population, instance, plot_data, counters=None, cache=None):
+    for generation in range(len(plot_data)):
+        first_child, second_child = offspring(population, instance, counters)
+        first_penalty_point = evaluate(first_child, instance, counters, cache)
+        second_penalty_point = evaluate(second_child, instance, counters, cache)
+        replacement(population, first_child, second_child, first_penalty_point, second_penalty_point)
+        plot_data[generation] = po.best_penalty_point(population)
 
 
 # reproduce new chromosomes in new generation
-def reproduction(max_generations, population, penalty_points, presentation_presentation,
-                 presentation_supervisor, supervisor_preference):
-    plot_data = []
+# children already in the penalty cache (if it is given) are not evaluated again
+# termination: generations stop early once the stopping criteria are met (checked after every 10 generations)
+# returns chromosomes and penalty points ordered by penalty points
+def reproduction(max_generations, population, penalty_points, instance, verbose=True, counters=None, cache=None,
+                 termination=None):
+    plot_data = np.empty(max_generations, dtype=np.int64)
+    population = po.create_population(population, penalty_points)  # updated in place by each generation
+    print_interval = 50
+    check_interval = print_interval if termination is None else 10
+    last_generation = 0
+
+    # generations between checks are compiled as a whole
+    for first_generation in range(0, max_generations, check_interval):
+        last_generation = min(first_generation + check_interval, max_generations)
+        generations(population, instance, plot_data[first_generation:last_generation], counters, cache)
+
+        if verbose and last_generation % print_interval == 0:
+            print("[Iteration ", last_generation, "] Penalty Point: ", plot_data[last_generation - 1], sep="")
+
+        if tn.stop_reason(termination, po.best_penalty_point(population),
+                          population.chromosomes[population.ranks[0]], instance, [plot_data[:last_generation]]):
+            break
+
+    population, penalty_points = po.sorted_population(population)
+    return population, penalty_points, plot_data[:last_generation]
+
+
+# produce children of many pairs of parents selected from the same population
+@njit(cache=True)
+def offspring_batch(population, instance, children, counters=None):
+    for pair in range(children.shape[0] // 2):
+        children[2 * pair], children[2 * pair + 1] = offspring(population, instance, counters)
+
+
+# batched Steady-State Genetic Algorithm - each generation produces a batch of children,
+# which are evaluated in parallel before they replace chromosomes of highest penalty points
+# returns chromosomes and penalty points ordered by penalty points
+def batch_reproduction(max_generations, population, penalty_points, instance, batch_size=32, counters=None):
+    plot_data = np.empty(max_generations, dtype=np.int64)
+    population = po.create_population(population, penalty_points)
+    children = np.empty((batch_size - batch_size % 2, population.chromosomes.shape[1]), dtype=np.int16)
 
     for generation in range(max_generations):
-        first_parent, second_parent = selection(population, penalty_points)
-        first_child, second_child = crossover(first_parent, second_parent)
-        first_child = mutation(first_child)
-        second_child = mutation(second_child)
-        first_penalty_point = \
-            penalty(first_child, presentation_presentation, presentation_supervisor, supervisor_preference)[0]
-        second_penalty_point = \
-            penalty(second_child, presentation_presentation, presentation_supervisor, supervisor_preference)[0]
-        population, penalty_points = \
-            replacement(population, penalty_points, first_child, second_child,
-                        first_penalty_point, second_penalty_point)
-        plot_data.append(penalty_points[0])
-
-        if (generation + 1) % 50 == 0:
-            print("[Iteration ", generation + 1, "] Penalty Point: ", penalty_points[0], sep="")
+        offspring_batch(population, instance, children, counters)
+        children_penalty_points = batch_penalty(children, instance)[0]
+
+        if counters is not None:
+            counters[tm.evaluations] += len(children)
+
+        for child in range(len(children)):
+            po.insert(population, children[child], children_penalty_points[child])
+
+        plot_data[generation] = po.best_penalty_point(population)
 
+    population, penalty_points = po.sorted_population(population)
     return population, penalty_points, plot_data
@@ -1,56 +1,265 @@
 import data as dt
 from penalty_function import penalty
+import penalty_function as pf
 import genetic_algorithm as ga
-import simulated_annealing as sa
+import island_model as im
+import parallel_annealing as pa
+import tabu_search as ts
+import telemetry as tm
+import checkpoint as ck
+import schedule as sc
+import precompile as pr
+import termination as tn
 import numpy as np
+import os
+import argparse
 from timeit import default_timer as timer
 
 
+# state of a stage stored in a checkpoint with a prefix (None if the checkpoint is of an earlier stage)
+def stage_state(state, stage, prefix):
+    if state is None or int(state["stage"]) != stage:
+        return None
+
+    return {name[len(prefix):]: value for name, value in state.items() if name.startswith(prefix)}
+
+
 # hybrid system using genetic algorithm and simulated annealing
-def hybrid_system():
-    # load data and functions
-    slot_presentation, presentation_presentation, presentation_supervisor, supervisor_preference = dt.load()
+# headless: result files are written on a background thread, which is returned
+# telemetry: counters and wall time of each phase are recorded if telemetry is given
+# checkpoint_path: state is written after every migration and every checkpoint_interval iterations of annealing,
+# a resumed run continues from the checkpoint and produces the same result as an uninterrupted run
+# cache_capacity: penalty points of up to cache_capacity recent schedules are cached by each island and chain
+# input_directory: csv files of the problem instance, which is preprocessed once and then read from instance_cache
+# (a directory, None for .instance_cache in the input directory or False to always parse the csv files)
+# time_budget: seconds of the whole run, annealing is calibrated to finish at the deadline (or earlier, leaving the
+# time of tabu_iterations iterations of tabu search)
+# target_penalty_point: both phases stop once the best schedule violates no hard constraint and its penalty points
+# are at most the target
+# stall_limit: each phase stops after stall_limit iterations (generations of GA) without improvement
+# process_no: no. of annealing chains (or replicas), each run by a worker process (1 per processor core by default,
+# hence a seed only reproduces a schedule with the same process_no and island_no)
+# island_no: no. of islands of the genetic algorithm, each run by a worker process (process_no by default)
+# migration_interval, topology: generations between migrations and islands receiving the migrants of each island
+# (see island_model.topologies), a resumed run uses the nos. and topology of the interrupted run
+# annealing: multi_start runs chains from the best chromosomes, tempering runs replicas on a ladder of temperatures
+# which exchange candidates (see parallel_annealing.annealing_modes), a resumed run uses the mode of the interrupted run
+# tabu_iterations: iterations of tabu search intensifying the best candidate of annealing (0 skips tabu search)
+def hybrid_system(headless=False, output_directory=".", result_format="csv", telemetry=None, seed=None,
+                  checkpoint_path=None, checkpoint_interval=10000, resume=False, cache_capacity=0,
+                  input_directory="input_files", instance_cache=None, time_budget=None, target_penalty_point=None,
+                  stall_limit=None, process_no=None, tabu_iterations=0, island_no=None, migration_interval=10,
+                  topology="ring", annealing="multi_start"):
+    termination = None if time_budget is None and target_penalty_point is None and stall_limit is None else \
+        tn.create(time_budget, target_penalty_point, stall_limit)
+
+    if annealing not in pa.annealing_modes:
+        raise ValueError(f"Unknown annealing mode: {annealing}")
+
+    counters = tm.counters_of(telemetry)
+    state = ck.load(checkpoint_path) if resume else None
+
+    # compile functions before worker processes are forked and before the generators are seeded
+    with tm.phase(telemetry, "compile"):
+        pr.precompile(counters is not None, cache_capacity > 0)
+
+    seed = int(state["seed"]) if state is not None else np.random.randint(2 ** 31) if seed is None else seed
+    # a resumed run keeps the islands and chains of the interrupted run, whatever the cores of this machine
+    if state is not None:
+        process_no, island_no = int(state["process_no"]), int(state["island_no"])
+        migration_interval, topology = int(state["migration_interval"]), str(state["topology"])
+        annealing = str(state["annealing"])
+    else:
+        process_no = os.cpu_count() if process_no is None else process_no
+        island_no = process_no if island_no is None else island_no
+
+    np.random.seed(seed)
+    sc.seed_compiled_random(seed)
 
-    # initialize matrices
-    slot_no = slot_presentation.shape[0]
-    presentation_no = slot_presentation.shape[1]
+    # write state of a stage to the checkpoint, with extra arrays needed by later stages
+    def checkpoint(stage, prefix, extra):
+        if checkpoint_path is None:
+            return None
+
+        def save(current_state):
+            saved = {"seed": np.array(seed), "stage": np.array(stage), "process_no": np.array(process_no),
+                     "island_no": np.array(island_no), "migration_interval": np.array(migration_interval),
+                     "topology": np.array(topology), "annealing": np.array(annealing)}
+            saved.update(extra)
+            saved.update({prefix + name: value for name, value in current_state.items()})
+            ck.save(checkpoint_path, saved)
+
+        return save
+
+    # load data and precomputed indexes of the problem instance
+    with tm.phase(telemetry, "load"):
+        instance = dt.load(input_directory, instance_cache is not False, instance_cache or None)
+        timetable = dt.load_timetable(input_directory)
+
+    # initialize matrices (each chromosome is stored as the slot assigned to each presentation)
+    # 1 island of population per process
+    presentation_no = instance.availability.shape[1]
     population_size = 10
-    population = np.empty([population_size, slot_no, presentation_no], dtype=np.int8)
-    penalty_points = np.empty(population_size, dtype=int)
-
-    # create initial population
-    for i in range(population_size):
-        chromosome = ga.generate_chromosome(slot_presentation)
-        population[i] = chromosome
-        penalty_point = \
-            penalty(chromosome, presentation_presentation, presentation_supervisor, supervisor_preference)[0]
-        penalty_points[i] = penalty_point
-
-    # sort initial population based on penalty points
-    population = population[penalty_points.argsort()]
-    penalty_points = penalty_points[penalty_points.argsort()]
-
-    # run genetic algorithm for 100 generations
+    populations = np.empty([island_no, population_size, presentation_no], dtype=np.int16)
+    penalty_points = np.empty([island_no, population_size], dtype=int)
+    ga_state = stage_state(state, 0, "ga_")
+    sa_state = stage_state(state, 1, "sa_")
+
+    if state is None:
+        with tm.phase(telemetry, "ga_init"):
+            # create initial population of each island
+            for island in range(island_no):
+                for i in range(population_size):
+                    populations[island][i] = ga.construct_chromosome(instance).presentation_slot
+
+            # evaluate initial population of all islands at once
+            penalty_points[:] = \
+                pf.batch_penalty(populations.reshape(-1, presentation_no), instance)[0].reshape(island_no, -1)
+
+            if counters is not None:
+                counters[tm.evaluations] += penalty_points.size
+
+            for island in range(island_no):
+                # sort initial population based on penalty points
+                order = penalty_points[island].argsort()
+                populations[island] = populations[island][order]
+                penalty_points[island] = penalty_points[island][order]
+
+    # run genetic algorithm for 100 generations, islands exchange their best chromosomes every migration interval
     ga_max_generations = 100
-    population, penalty_points, ga_plot_data = \
-        ga.reproduction(ga_max_generations, population, penalty_points, presentation_presentation,
-                        presentation_supervisor, supervisor_preference)
-
-    # run simulated annealing after running genetic algorithm
-    temperature = penalty_points[population_size - 1] - penalty_points[0]
-    candidate = population[0]
-    penalty_point = penalty_points[0]
-    best_candidate, best_penalty_point, sa_plot_data = \
-        sa.anneal(temperature, candidate, penalty_point, presentation_presentation,
-                  presentation_supervisor, supervisor_preference)
+
+    if sa_state is None:
+        with tm.phase(telemetry, "ga"):
+            population, penalty_points, ga_plot_data = \
+                im.island_reproduction(ga_max_generations, populations, penalty_points, instance, migration_interval,
+                                       topology=topology, seed=seed, telemetry=telemetry,
+                                       checkpoint=checkpoint(0, "ga_", {}), state=ga_state,
+                                       cache_capacity=cache_capacity, termination=termination)
+
+        # run simulated annealing after running genetic algorithm
+        # 1 chain per process starting from the best chromosomes
+        # initial temperature is the gap between the best and the worst of the best population_size distinct
+        # chromosomes of all islands (which come first in the merged population), whatever the no. of islands
+        distinct_no = min(len(np.unique(population, axis=0)), population_size)
+        temperature = penalty_points[distinct_no - 1] - penalty_points[0]
+    else:
+        population, penalty_points, temperature = None, None, None
+        ga_plot_data = state["ga_plot_data"]
+
+    # with a time budget, annealing is calibrated to finish early enough for tabu_iterations iterations of tabu search
+    # (timed on the best schedule so far), at most half of the remaining time is left to tabu search
+    tabu_time = 0.0
+
+    if tabu_iterations > 0 and tn.remaining_time(termination) < np.inf:
+        if sa_state is None:
+            candidate = sc.create_schedule(population[0], instance.availability.shape[0])
+            candidate_penalty_point = penalty_points[0]
+        else:
+            candidate = ck.schedules_of("best", sa_state)[int(np.argmin(sa_state["best_penalty_points"]))]
+            candidate_penalty_point = sa_state["best_penalty_points"].min()
+
+        tabu_time = min(ts.estimate_time(candidate, candidate_penalty_point, instance, tabu_iterations),
+                        0.5 * tn.remaining_time(termination))
+
+    with tm.phase(telemetry, "sa"):
+        if annealing == "multi_start":
+            best_candidate, best_penalty_point, sa_plot_data = \
+                pa.multi_start_anneal(temperature, population, penalty_points, instance, process_no, seed + 1,
+                                      telemetry=telemetry,
+                                      checkpoint=checkpoint(1, "sa_", {"ga_plot_data": ga_plot_data}),
+                                      checkpoint_interval=None if checkpoint_path is None else checkpoint_interval,
+                                      state=sa_state, cache_capacity=cache_capacity,
+                                      termination=tn.reserve(termination, tabu_time))
+        else:
+            # 1 replica per process, replicas exchange candidates after every 1000 iterations
+            best_candidate, best_penalty_point, sa_plot_data = \
+                pa.parallel_tempering(temperature, population, penalty_points, instance, process_no, seed=seed + 1,
+                                      telemetry=telemetry,
+                                      checkpoint=checkpoint(1, "sa_", {"ga_plot_data": ga_plot_data}),
+                                      state=sa_state, cache_capacity=cache_capacity,
+                                      termination=tn.reserve(termination, tabu_time))
+
+    # run tabu search after simulated annealing to remove remaining penalty points of soft constraints
+    if tabu_iterations > 0:
+        with tm.phase(telemetry, "tabu"):
+            best_candidate, best_penalty_point, tabu_plot_data = \
+                ts.tabu_search(best_candidate, best_penalty_point, instance, tabu_iterations, seed=seed + 2,
+                               telemetry=telemetry, termination=termination)
+            sa_plot_data = np.concatenate([sa_plot_data, tabu_plot_data])
+
+            if len(tabu_plot_data) > 0:
+                print("[Iteration ", 100 + len(sa_plot_data), "] Penalty Point: ", best_penalty_point, sep="")
 
     # write result data
-    constraint_counts = \
-        penalty(best_candidate, presentation_presentation, presentation_supervisor, supervisor_preference)
-    plot_data = np.concatenate([ga_plot_data, sa_plot_data])
-    dt.write(best_candidate, supervisor_preference, constraint_counts, plot_data)
+    with tm.phase(telemetry, "write"):
+        constraint_counts = penalty(best_candidate.presentation_slot, instance)
+        tm.record(telemetry, "result", penalty_point=int(constraint_counts[0]),
+                  hard_constraints=int(constraint_counts[1]), soft_constraints=int(constraint_counts[2]))
+        supervisor_statistics = pf.supervisor_statistics(best_candidate.presentation_slot, instance)
+        plot_data = np.concatenate([ga_plot_data, sa_plot_data])
+        return dt.write(best_candidate, instance.supervisor_preference, supervisor_statistics, constraint_counts,
+                        plot_data, timetable, headless, output_directory, result_format)
+
+
+# command-line interface of the hybrid system (arguments are read from sys.argv if they are not given)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schedule presentations using hybrid genetic algorithm and "
+                                                 "simulated annealing")
+    parser.add_argument("--headless", action="store_true",
+                        help="write result files in the background without showing the graph or printing the schedule")
+    parser.add_argument("--output-directory", default=".", help="directory of result files")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv", help="format of the schedule file")
+    parser.add_argument("--telemetry", metavar="PATH", help="append counters and phase times to a JSON-lines file")
+    parser.add_argument("--seed", type=int, help="seed of the random number generators (a schedule is reproduced "
+                                                 "with the same seed, --processes and --islands)")
+    parser.add_argument("--checkpoint", metavar="PATH", help="write checkpoints of the run to a file")
+    parser.add_argument("--checkpoint-interval", type=int, default=10000,
+                        help="iterations of simulated annealing between checkpoints")
+    parser.add_argument("--resume", metavar="PATH", help="resume from a checkpoint and keep writing checkpoints to it")
+    parser.add_argument("--penalty-cache", type=int, default=0, metavar="CAPACITY",
+                        help="cache penalty points of recent schedules (0 disables the cache)")
+    parser.add_argument("--input-directory", default="input_files", help="directory of input csv files")
+    parser.add_argument("--instance-cache", metavar="DIRECTORY",
+                        help="directory of preprocessed instances (default: .instance_cache in the input directory)")
+    parser.add_argument("--no-instance-cache", action="store_true",
+                        help="parse the input files without reading or writing a preprocessed instance")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                        help="stop at a deadline, annealing is calibrated to finish at the deadline")
+    parser.add_argument("--target-penalty", type=int, metavar="PENALTY_POINTS",
+                        help="stop once no hard constraint is violated and penalty points are at most the target")
+    parser.add_argument("--stall-limit", type=int, metavar="ITERATIONS",
+                        help="stop a phase after this many iterations (generations of GA) without improvement")
+    parser.add_argument("--processes", type=int, metavar="N",
+                        help="no. of annealing chains, and of islands unless --islands is given "
+                             "(default: no. of processor cores)")
+    parser.add_argument("--islands", type=int, metavar="N", help="no. of islands of the genetic algorithm")
+    parser.add_argument("--migration-interval", type=int, default=10, metavar="GENERATIONS",
+                        help="generations of the genetic algorithm between migrations")
+    parser.add_argument("--topology", choices=im.topologies, default="ring",
+                        help="islands receiving the best chromosomes of each island")
+    parser.add_argument("--annealing", choices=pa.annealing_modes, default="multi_start",
+                        help="chains from the best chromosomes, or replicas on a temperature ladder exchanging "
+                             "candidates")
+    parser.add_argument("--tabu-iterations", type=int, default=0, metavar="N",
+                        help="iterations of tabu search after simulated annealing (0 skips tabu search)")
+    arguments = parser.parse_args(argv)
+    telemetry = tm.create(path=arguments.telemetry) if arguments.telemetry is not None else None
+
+    start = timer()
+    writer = hybrid_system(arguments.headless, arguments.output_directory, arguments.format, telemetry,
+                           arguments.seed, arguments.resume or arguments.checkpoint, arguments.checkpoint_interval,
+                           arguments.resume is not None, arguments.penalty_cache, arguments.input_directory,
+                           False if arguments.no_instance_cache else arguments.instance_cache,
+                           arguments.time_budget, arguments.target_penalty, arguments.stall_limit,
+                           arguments.processes, arguments.tabu_iterations, arguments.islands,
+                           arguments.migration_interval, arguments.topology, arguments.annealing)
+    tm.close(telemetry)
+    print("\nExecution Time of Hybrid System:", round(timer() - start, 2), "seconds")
+
+    if writer is not None:
+        writer.join()
+        print("Result files written to", os.path.abspath(arguments.output_directory))
 
 
-start = timer()
-hybrid_system()
-print("\nExecution Time of Hybrid System:", round(timer() - start, 2), "seconds")
+if __name__ == "__main__":  # worker processes import this module without running the hybrid system
+    main()
@@ -0,0 +1,123 @@
+import data as dt
+import numpy as np
+import argparse
+import csv
+import os
+
+
+# write rows to a csv file in a directory
+def write_csv(directory, filename, rows, header=None):
+    with open(os.path.join(directory, filename), 'w', newline='') as file:
+        writer = csv.writer(file)
+
+        if header is not None:
+            writer.writerow(header)
+
+        writer.writerows(rows)
+
+
+# code of a presentation (P1, P2, ...) from its index
+def presentation_code(presentation):
+    return f"P{presentation + 1}"
+
+
+# code of a supervisor (S001, S002, ...) from its index
+def supervisor_code(supervisor):
+    return f"S{str(supervisor + 1).zfill(3)}"
+
+
+# generate a synthetic problem instance and write it as input files (SupExaAssign, HC03, HC04, SC01-SC03, Timetable)
+# each presentation has 1 supervisor and 2 examiners, all distinct
+# density is controlled by the fraction of unavailable slots of each supervisor and each venue
+# no. of days is derived from the load factor (presentations per slot) if it is not given
+def generate(directory, presentation_no, supervisor_no=None, day_no=None, venue_no=4, time_slot_no=15,
+             load_factor=0.4, supervisor_unavailability=0.05, venue_unavailability=0.05, seed=0):
+    random_state = np.random.RandomState(seed)
+    supervisor_no = max(3, presentation_no * 2 // 5) if supervisor_no is None else supervisor_no
+    day_no = max(1, int(np.ceil(presentation_no / (load_factor * venue_no * time_slot_no)))) \
+        if day_no is None else day_no
+    slot_no = venue_no * time_slot_no * day_no
+    day_slot_no = venue_no * time_slot_no
+
+    if supervisor_no < 3:
+        raise ValueError("At least 3 supervisors are required")
+
+    if presentation_no > slot_no:
+        raise ValueError(f"{presentation_no} presentations do not fit in {slot_no} slots")
+
+    dt.check_size(slot_no, presentation_no, supervisor_no, venue_no)
+
+    os.makedirs(directory, exist_ok=True)
+
+    # SupExaAssign.csv
+    write_csv(directory, 'SupExaAssign.csv',
+              [[presentation_code(presentation)] +
+               [supervisor_code(supervisor) for supervisor in random_state.choice(supervisor_no, 3, replace=False)]
+               for presentation in range(presentation_no)],
+              header=["#", "Supervisor", "Examiner 1", "Examiner 2"])
+
+    # HC03.csv (venue unavailability), slots are numbered from 1
+    venue_rows = []
+
+    for venue in range(venue_no):
+        slots = np.arange(slot_no)
+        slots = slots[(slots % day_slot_no) // time_slot_no == venue]
+        unavailable = slots[random_state.random_sample(len(slots)) < venue_unavailability]
+        venue_rows.append([f"V{venue + 1}"] + [slot + 1 for slot in unavailable])
+
+    write_csv(directory, 'HC03.csv', venue_rows)
+
+    # HC04.csv (staff unavailability), a supervisor is unavailable for all venues of a day and time slot
+    staff_rows = []
+
+    for supervisor in range(supervisor_no):
+        groups = np.nonzero(random_state.random_sample(day_no * time_slot_no) < supervisor_unavailability)[0]
+        slots = sorted(group // time_slot_no * day_slot_no + venue * time_slot_no + group % time_slot_no
+                       for group in groups for venue in range(venue_no))
+        staff_rows.append([supervisor_code(supervisor)] + [slot + 1 for slot in slots])
+
+    write_csv(directory, 'HC04.csv', staff_rows)
+
+    # SC01.csv (consecutive presentations), SC02.csv (number of days) and SC03.csv (change of venue)
+    supervisors = range(supervisor_no)
+    write_csv(directory, 'SC01.csv', [[supervisor_code(supervisor), random_state.randint(2, 6)]
+                                      for supervisor in supervisors])
+    write_csv(directory, 'SC02.csv', [[supervisor_code(supervisor), random_state.randint(1, day_no + 1)]
+                                      for supervisor in supervisors])
+    write_csv(directory, 'SC03.csv', [[supervisor_code(supervisor), random_state.choice(["yes", "no"])]
+                                      for supervisor in supervisors])
+
+    # Timetable.csv (venues, days and time slots)
+    timetable = dt.Timetable([f"Venue {venue + 1}" for venue in range(venue_no)],
+                             [f"Day {day + 1}" for day in range(day_no)],
+                             [f"T{time_slot + 1}" for time_slot in range(time_slot_no)])
+    write_csv(directory, 'Timetable.csv', [["Venue"] + timetable.venues, ["Day"] + timetable.days,
+                                           ["Time Slot"] + timetable.time_slots])
+    return timetable
+
+
+# generate input files of a synthetic problem instance from command line arguments
+def main():
+    parser = argparse.ArgumentParser(description="Generate input files of a synthetic presentation scheduling problem")
+    parser.add_argument("directory", help="output directory of input files")
+    parser.add_argument("--presentations", type=int, required=True, help="no. of presentations")
+    parser.add_argument("--supervisors", type=int, help="no. of supervisors (default: 2/5 of presentations)")
+    parser.add_argument("--days", type=int, help="no. of days (default: derived from load factor)")
+    parser.add_argument("--venues", type=int, default=4, help="no. of venues")
+    parser.add_argument("--time-slots", type=int, default=15, help="no. of time slots per day")
+    parser.add_argument("--load-factor", type=float, default=0.4, help="presentations per slot if days are derived")
+    parser.add_argument("--supervisor-unavailability", type=float, default=0.05,
+                        help="fraction of time slots each supervisor is unavailable")
+    parser.add_argument("--venue-unavailability", type=float, default=0.05,
+                        help="fraction of slots each venue is unavailable")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random number generator")
+    arguments = parser.parse_args()
+    timetable = generate(arguments.directory, arguments.presentations, arguments.supervisors, arguments.days,
+                         arguments.venues, arguments.time_slots, arguments.load_factor,
+                         arguments.supervisor_unavailability, arguments.venue_unavailability, arguments.seed)
+    slot_no = len(timetable.venues) * len(timetable.time_slots) * len(timetable.days)
+    print(f"{arguments.presentations} presentations and {slot_no} slots written to {arguments.directory}")
+
+
+if __name__ == "__main__":
+    main()
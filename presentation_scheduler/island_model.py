@@ -0,0 +1,150 @@
+import genetic_algorithm as ga
+import schedule as sc
+import worker_pool as wp
+import telemetry as tm
+import checkpoint as ck
+import penalty_cache as pc
+import termination as tn
+import numpy as np
+
+topologies = ("ring", "fully_connected", "random")
+
+
+# evolve an island for a number of generations in a worker process
+# counters of the island are returned if they are requested (None otherwise), the penalty cache is returned with them
+def island_task(generations, population, penalty_points, seed, with_counters=False, cache=None):
+    np.random.seed(seed)
+    sc.seed_compiled_random(seed)
+    counters = tm.new_counters() if with_counters else None
+    statistics = None if cache is None else cache.statistics.copy()
+    population, penalty_points, plot_data = \
+        ga.reproduction(generations, population, penalty_points, wp.worker_instance, verbose=False,
+                        counters=counters, cache=cache)
+    tm.add_cache_statistics(counters, cache, statistics)
+    return population, penalty_points, plot_data, counters, cache
+
+
+# islands receiving migrants from each island based on migration topology
+def destinations(island, island_no, topology, random_state):
+    if island_no == 1:
+        return []
+    elif topology == "ring":
+        return [(island + 1) % island_no]
+    elif topology == "fully_connected":
+        return [other_island for other_island in range(island_no) if other_island != island]
+    else:
+        other_island = random_state.randint(island_no - 1)
+        return [other_island if other_island < island else other_island + 1]
+
+
+# best chromosomes of each island replace the worst chromosomes of the destination islands
+# like a child in the steady-state population, an immigrant is discarded if it is worse than the worst chromosome or
+# already in the destination island, so that islands stay diverse
+def migration(populations, penalty_points, migrant_no, topology, random_state):
+    island_no = len(populations)
+    immigrants = [[] for _ in range(island_no)]
+
+    for island in range(island_no):
+        for destination in destinations(island, island_no, topology, random_state):
+            for migrant in range(migrant_no):
+                immigrants[destination].append((populations[island][migrant].copy(), penalty_points[island][migrant]))
+
+    for island in range(island_no):
+        for chromosome, penalty_point in immigrants[island]:
+            if penalty_point > penalty_points[island][-1] or \
+                    any(np.array_equal(chromosome, other_chromosome) for other_chromosome in populations[island]):
+                continue
+
+            populations[island][-1] = chromosome
+            penalty_points[island][-1] = penalty_point
+
+            # sort population based on penalty points
+            order = penalty_points[island].argsort(kind="mergesort")
+            populations[island] = populations[island][order]
+            penalty_points[island] = penalty_points[island][order]
+
+
+# merge the populations of all islands ordered by penalty points, distinct chromosomes come before copies of them
+# (islands may evolve the same chromosome), hence the best chromosomes of the merged population are distinct
+def merge(populations, penalty_points):
+    population = np.concatenate(populations)
+    penalty_points = np.concatenate(penalty_points)
+    order = penalty_points.argsort(kind="mergesort")
+    population, penalty_points = population[order], penalty_points[order]
+    distinct = np.zeros(len(population), dtype=bool)
+    distinct[np.unique(population, axis=0, return_index=True)[1]] = True
+    order = np.concatenate([np.flatnonzero(distinct), np.flatnonzero(~distinct)])
+    return population[order], penalty_points[order]
+
+
+# state of the islands after a generation
+def island_state(seed, generation, populations, penalty_points, random_state, plot_data):
+    state = {"seed": np.array(seed), "generation": np.array(generation), "populations": np.stack(populations),
+             "penalty_points": np.stack(penalty_points), "plot_data": plot_data}
+    state.update(ck.random_state_arrays(random_state))
+    return state
+
+
+# Island-Model Genetic Algorithm - evolve islands across processes and exchange their best chromosomes
+# islands migrate after every migration interval, the populations of all islands are merged at the end
+# checkpoint is called with the state after each migration, a run resumed from a state continues identically
+# each island keeps a penalty cache of cache_capacity chromosomes (no cache if it is 0)
+# termination: islands stop early once the stopping criteria are met (checked after each migration)
+def island_reproduction(max_generations, populations, penalty_points, instance, migration_interval=10,
+                        migrant_no=1, topology="ring", seed=None, telemetry=None, checkpoint=None, state=None,
+                        cache_capacity=0, termination=None):
+    if topology not in topologies:
+        raise ValueError(f"Unknown migration topology: {topology}")
+
+    if state is not None:
+        populations, penalty_points = state["populations"], state["penalty_points"]
+        seed = int(state["seed"])
+
+    island_no = len(populations)
+    seed = np.random.randint(2 ** 31) if seed is None else seed
+    random_state = np.random.RandomState(seed) if state is None else ck.random_state_of(state)  # reproducible
+    populations = list(populations)
+    penalty_points = list(penalty_points)
+    plot_data = [np.empty(0, dtype=np.int64) if state is None else state["plot_data"]]
+    start_generation = 0 if state is None else int(state["generation"])
+    caches = [pc.create_cache(cache_capacity) if cache_capacity > 0 else None for _ in range(island_no)]
+    pool = wp.create_pool(island_no, instance)
+
+    try:
+        for first_generation in range(start_generation, max_generations, migration_interval):
+            generations = min(migration_interval, max_generations - first_generation)
+            tasks = [(generations, populations[island], penalty_points[island],
+                      int(np.random.SeedSequence([seed, island, first_generation]).generate_state(1)[0]),
+                      telemetry is not None, caches[island]) for island in range(island_no)]
+            results = wp.run_tasks(pool, island_task, tasks)
+            populations = [result[0] for result in results]
+            penalty_points = [result[1] for result in results]
+            caches = [result[4] for result in results]
+            plot_data.append(np.min([result[2] for result in results], axis=0))
+            migration(populations, penalty_points, migrant_no, topology, random_state)
+            best_penalty_point = min(island_penalty_points[0] for island_penalty_points in penalty_points)
+
+            for result in results:
+                tm.add_counters(telemetry, result[3])
+
+            tm.record(telemetry, "progress", phase="ga", iteration=first_generation + generations,
+                      penalty_point=int(best_penalty_point))
+
+            if (first_generation + generations) % 50 < generations:
+                print("[Iteration ", first_generation + generations, "] Penalty Point: ", best_penalty_point, sep="")
+
+            if checkpoint is not None:
+                checkpoint(island_state(seed, first_generation + generations, populations, penalty_points,
+                                        random_state, np.concatenate(plot_data)))
+
+            best_island = min(range(island_no), key=lambda island: penalty_points[island][0])
+            reason = tn.stop_reason(termination, best_penalty_point, populations[best_island][0], instance, plot_data)
+
+            if reason is not None:
+                tm.record(telemetry, "termination", phase="ga", reason=reason, iteration=first_generation + generations)
+                break
+    finally:
+        wp.close_pool(pool)
+
+    population, penalty_points = merge(populations, penalty_points)
+    return population, penalty_points, np.concatenate(plot_data)
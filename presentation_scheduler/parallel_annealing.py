@@ -0,0 +1,291 @@
+import simulated_annealing as sa
+import schedule as sc
+import worker_pool as wp
+import telemetry as tm
+import checkpoint as ck
+import penalty_cache as pc
+import termination as tn
+import numpy as np
+import os
+from timeit import default_timer as timer
+
+annealing_modes = ("multi_start", "tempering")
+
+
+# run a chain of Simulated Annealing in a worker process
+# counters of the chain are returned if they are requested (None otherwise)
+# neighbourhood structures are selected adaptively if the quality of each structure is given
+# the penalty cache (if it is given) is returned with the quality so that the next segment can use them
+def chain_task(temperature, alpha, iteration_no, current_candidate, current_penalty_point,
+               best_candidate, best_penalty_point, seed, with_counters=False, operator_quality=None, cache=None):
+    plot_data = np.empty(iteration_no, dtype=np.int64)
+    counters = tm.new_counters() if with_counters else None
+    statistics = None if cache is None else cache.statistics.copy()
+    current_penalty_point, best_penalty_point, temperature = \
+        sa.anneal_chain(temperature, alpha, current_candidate, current_penalty_point, best_candidate,
+                        best_penalty_point, plot_data, seed, wp.worker_instance, counters, operator_quality, cache)
+    tm.add_cache_statistics(counters, cache, statistics)
+    return current_candidate, current_penalty_point, best_candidate, best_penalty_point, plot_data, counters, \
+        temperature, operator_quality, cache
+
+
+# reproducible seed of a chain, independent of the process running the chain
+def chain_seed(seed, chain, step=0):
+    return int(np.random.SeedSequence([seed, chain, step]).generate_state(1)[0])
+
+
+# state of the chains after an iteration
+def chain_state(seed, iteration, segment, iteration_no, temperatures, current_candidates, current_penalty_points,
+                best_candidates, best_penalty_points, plot_data, operator_qualities, final_temperature):
+    state = {"seed": np.array(seed), "iteration": np.array(iteration), "segment": np.array(segment),
+             "iteration_no": np.array(iteration_no), "temperatures": np.array(temperatures),
+             "final_temperature": np.array(final_temperature),
+             "current_penalty_points": np.array(current_penalty_points),
+             "best_penalty_points": np.array(best_penalty_points), "plot_data": plot_data}
+    state.update(ck.schedule_arrays("current", current_candidates))
+    state.update(ck.schedule_arrays("best", best_candidates))
+
+    if operator_qualities[0] is not None:
+        state["operator_qualities"] = np.stack(operator_qualities)
+
+    return state
+
+
+# Multi-Start Simulated Annealing - run independent chains from the best chromosomes across processes
+# chromosomes are ordered by penalty points, chain i starts from chromosome i (wrapping around)
+# chains run in segments of checkpoint_interval iterations (all iterations if it is None),
+# checkpoint is called with the state after each segment, a run resumed from a state continues identically
+# (population, penalty points and initial temperature are ignored if a state is given)
+# adaptive: each chain learns which neighbourhood structures are productive instead of selecting them uniformly
+# each chain keeps a penalty cache of cache_capacity schedules (no cache if it is 0)
+# termination: chains stop early once the stopping criteria are met (checked after every termination_interval
+# iterations), with a time budget the annealing schedule is recalibrated after each segment from the measured speed
+# so that chains reach the final temperature at the deadline
+def multi_start_anneal(initial_temperature, population, penalty_points, instance, chain_no=None, seed=None,
+                       telemetry=None, checkpoint=None, checkpoint_interval=None, state=None, adaptive=True,
+                       cache_capacity=0, termination=None, termination_interval=1000):
+    alpha = 0.9999  # annealing schedule to decrease temperature
+
+    if state is None:
+        chain_no = os.cpu_count() if chain_no is None else chain_no
+        seed = np.random.randint(2 ** 31) if seed is None else seed
+        slot_no = instance.availability.shape[0]
+        final_temperature = 0.0001 * initial_temperature
+        iteration_no = sa.iteration_count(initial_temperature, final_temperature, alpha)
+        iteration = 0
+        segment = 0
+        temperatures = [initial_temperature] * chain_no
+        current_candidates = []
+        current_penalty_points = []
+
+        for chain in range(chain_no):
+            current_candidates.append(sc.create_schedule(population[chain % len(population)], slot_no))
+            current_penalty_points.append(penalty_points[chain % len(population)])
+
+        best_candidates = [sc.copy_schedule(candidate) for candidate in current_candidates]
+        best_penalty_points = list(current_penalty_points)
+        plot_data = [np.empty(0, dtype=np.int64)]
+        operator_qualities = [np.ones(tm.neighbourhood_structure_no) if adaptive else None for _ in range(chain_no)]
+    else:
+        seed, iteration, segment, iteration_no = \
+            int(state["seed"]), int(state["iteration"]), int(state["segment"]), int(state["iteration_no"])
+        final_temperature = float(state["final_temperature"])
+        temperatures = list(state["temperatures"])
+        current_candidates = ck.schedules_of("current", state)
+        current_penalty_points = list(state["current_penalty_points"])
+        best_candidates = ck.schedules_of("best", state)
+        best_penalty_points = list(state["best_penalty_points"])
+        plot_data = [state["plot_data"]]
+        chain_no = len(current_candidates)
+        operator_qualities = list(state["operator_qualities"]) if "operator_qualities" in state else [None] * chain_no
+
+    segment_size = iteration_no if checkpoint_interval is None else checkpoint_interval
+    segment_size = segment_size if termination is None else min(segment_size, termination_interval)
+    alphas = [alpha] * chain_no
+    caches = [pc.create_cache(cache_capacity) if cache_capacity > 0 else None for _ in range(chain_no)]
+    pool = wp.create_pool(chain_no, instance)
+
+    try:
+        while iteration < iteration_no:
+            best_chain = int(np.argmin(best_penalty_points))
+            reason = tn.stop_reason(termination, best_penalty_points[best_chain],
+                                    best_candidates[best_chain].presentation_slot, instance, plot_data)
+
+            if reason is not None:
+                tm.record(telemetry, "termination", phase="sa", reason=reason, iteration=iteration)
+                break
+
+            iterations = min(segment_size, iteration_no - iteration)
+            start = timer()
+            tasks = [(temperatures[chain], alphas[chain], iterations, current_candidates[chain],
+                      current_penalty_points[chain], best_candidates[chain], best_penalty_points[chain],
+                      chain_seed(seed, chain, segment),
+                      telemetry is not None, operator_qualities[chain], caches[chain]) for chain in range(chain_no)]
+            results = wp.run_tasks(pool, chain_task, tasks)
+            current_candidates = [result[0] for result in results]
+            current_penalty_points = [result[1] for result in results]
+            best_candidates = [result[2] for result in results]
+            best_penalty_points = [result[3] for result in results]
+            temperatures = [result[6] for result in results]
+            operator_qualities = [result[7] for result in results]
+            caches = [result[8] for result in results]
+            plot_data.append(np.min([result[4] for result in results], axis=0))
+            iteration += iterations
+            segment += 1
+
+            # calibrate annealing schedule to the iterations which can still run before the deadline
+            if tn.remaining_time(termination) < np.inf:
+                remaining_iteration_no = int(tn.remaining_time(termination) * iterations / (timer() - start))
+                iteration_no = iteration + remaining_iteration_no
+                alphas = [tn.cooling_factor(temperature, final_temperature, remaining_iteration_no)
+                          for temperature in temperatures]
+
+            for result in results:
+                tm.add_counters(telemetry, result[5])
+
+            tm.record(telemetry, "progress", phase="sa", iteration=iteration,
+                      penalty_point=int(min(best_penalty_points)))
+
+            if checkpoint is not None:
+                checkpoint(chain_state(seed, iteration, segment, iteration_no, temperatures, current_candidates,
+                                       current_penalty_points, best_candidates, best_penalty_points,
+                                       np.concatenate(plot_data), operator_qualities, final_temperature))
+    finally:
+        wp.close_pool(pool)
+
+    # global best candidate and best penalty points over all chains after each iteration
+    best_chain = min(range(chain_no), key=lambda chain: best_penalty_points[chain])
+    print("[Iteration ", 100 + iteration, "] Penalty Point: ", best_penalty_points[best_chain], sep="")
+    return best_candidates[best_chain], best_penalty_points[best_chain], np.concatenate(plot_data)
+
+
+# state of the replicas after an exchange
+def replica_state(seed, iteration, exchange, iteration_no, temperatures, current_candidates, current_penalty_points,
+                  best_candidate, best_penalty_point, plot_data, operator_qualities, random_state):
+    state = {"seed": np.array(seed), "iteration": np.array(iteration), "exchange": np.array(exchange),
+             "iteration_no": np.array(iteration_no), "temperatures": np.array(temperatures),
+             "current_penalty_points": np.array(current_penalty_points),
+             "best_penalty_points": np.array([best_penalty_point]), "plot_data": plot_data}
+    state.update(ck.schedule_arrays("current", current_candidates))
+    state.update(ck.schedule_arrays("best", [best_candidate]))
+    state.update(ck.random_state_arrays(random_state))
+
+    if operator_qualities[0] is not None:
+        state["operator_qualities"] = np.stack(operator_qualities)
+
+    return state
+
+
+# Parallel Tempering - run replicas on a ladder of constant temperatures across processes
+# replicas of adjacent temperatures exchange candidates after every exchange interval
+# checkpoint is called with the state after each exchange, a run resumed from a state continues identically
+# (population, penalty points and initial temperature are ignored if a state is given)
+# adaptive: each temperature learns which neighbourhood structures are productive at that temperature
+# each replica keeps a penalty cache of cache_capacity schedules (no cache if it is 0)
+# termination: replicas stop early once the stopping criteria are met (checked after each exchange), with a time
+# budget replicas run as many iterations as can run before the deadline (measured after each exchange)
+def parallel_tempering(initial_temperature, population, penalty_points, instance, replica_no=None,
+                       exchange_interval=1000, seed=None, telemetry=None, checkpoint=None, state=None, adaptive=True,
+                       cache_capacity=0, termination=None):
+    if state is None:
+        replica_no = os.cpu_count() if replica_no is None else replica_no
+        seed = np.random.randint(2 ** 31) if seed is None else seed
+        random_state = np.random.RandomState(chain_seed(seed, replica_no))  # exchanges are reproducible
+        slot_no = instance.availability.shape[0]
+        final_temperature = 0.0001 * initial_temperature
+        iteration_no = sa.iteration_count(initial_temperature, final_temperature, 0.9999)
+
+        if iteration_no == 0:  # population has converged, hence there is nothing to anneal
+            return sc.create_schedule(population[0], slot_no), penalty_points[0], np.empty(0, dtype=np.int64)
+
+        iteration = 0
+        exchange = 0
+        # geometric temperature ladder from final temperature to initial temperature
+        temperatures = final_temperature * (initial_temperature / final_temperature) ** \
+            (np.arange(replica_no) / max(replica_no - 1, 1))
+        current_candidates = []
+        current_penalty_points = []
+
+        for replica in range(replica_no):
+            current_candidates.append(sc.create_schedule(population[replica % len(population)], slot_no))
+            current_penalty_points.append(penalty_points[replica % len(population)])
+
+        best_candidate = sc.copy_schedule(current_candidates[0])
+        best_penalty_point = current_penalty_points[0]
+        plot_data = [np.empty(0, dtype=np.int64)]
+        operator_qualities = [np.ones(tm.neighbourhood_structure_no) if adaptive else None for _ in range(replica_no)]
+    else:
+        seed, iteration, exchange, iteration_no = \
+            int(state["seed"]), int(state["iteration"]), int(state["exchange"]), int(state["iteration_no"])
+        random_state = ck.random_state_of(state)
+        temperatures = state["temperatures"]
+        current_candidates = ck.schedules_of("current", state)
+        current_penalty_points = list(state["current_penalty_points"])
+        best_candidate = ck.schedules_of("best", state)[0]
+        best_penalty_point = state["best_penalty_points"][0]
+        plot_data = [state["plot_data"]]
+        replica_no = len(current_candidates)
+        operator_qualities = list(state["operator_qualities"]) if "operator_qualities" in state else \
+            [None] * replica_no
+
+    caches = [pc.create_cache(cache_capacity) if cache_capacity > 0 else None for _ in range(replica_no)]
+    pool = wp.create_pool(replica_no, instance)
+
+    try:
+        while iteration < iteration_no:
+            reason = tn.stop_reason(termination, best_penalty_point, best_candidate.presentation_slot, instance,
+                                    plot_data)
+
+            if reason is not None:
+                tm.record(telemetry, "termination", phase="sa", reason=reason, iteration=iteration)
+                break
+
+            iterations = min(exchange_interval, iteration_no - iteration)
+            start = timer()
+            tasks = [(temperatures[replica], 1.0, iterations, current_candidates[replica],
+                      current_penalty_points[replica], sc.copy_schedule(best_candidate), best_penalty_point,
+                      chain_seed(seed, replica, exchange), telemetry is not None, operator_qualities[replica],
+                      caches[replica]) for replica in range(replica_no)]
+            results = wp.run_tasks(pool, chain_task, tasks)
+            current_candidates = [result[0] for result in results]
+            current_penalty_points = [result[1] for result in results]
+            operator_qualities = [result[7] for result in results]
+            caches = [result[8] for result in results]
+
+            for result in results:
+                tm.add_counters(telemetry, result[5])
+
+                if result[3] < best_penalty_point:
+                    best_candidate, best_penalty_point = result[2], result[3]
+
+            plot_data.append(np.min([result[4] for result in results], axis=0))
+
+            # exchange candidates between adjacent temperatures based on Metropolis criterion
+            for replica in range(exchange % 2, replica_no - 1, 2):
+                exponent = (1 / temperatures[replica] - 1 / temperatures[replica + 1]) * \
+                    (current_penalty_points[replica] - current_penalty_points[replica + 1])
+
+                if exponent >= 0 or random_state.random_sample() < np.exp(exponent):
+                    current_candidates[replica], current_candidates[replica + 1] = \
+                        current_candidates[replica + 1], current_candidates[replica]
+                    current_penalty_points[replica], current_penalty_points[replica + 1] = \
+                        current_penalty_points[replica + 1], current_penalty_points[replica]
+
+            iteration += iterations
+            exchange += 1
+
+            # run as many iterations as can still run before the deadline
+            if tn.remaining_time(termination) < np.inf:
+                iteration_no = iteration + int(tn.remaining_time(termination) * iterations / (timer() - start))
+
+            tm.record(telemetry, "progress", phase="sa", iteration=iteration, penalty_point=int(best_penalty_point))
+
+            if checkpoint is not None:
+                checkpoint(replica_state(seed, iteration, exchange, iteration_no, temperatures, current_candidates,
+                                         current_penalty_points, best_candidate, best_penalty_point,
+                                         np.concatenate(plot_data), operator_qualities, random_state))
+    finally:
+        wp.close_pool(pool)
+
+    print("[Iteration ", 100 + iteration, "] Penalty Point: ", best_penalty_point, sep="")
+    return best_candidate, best_penalty_point, np.concatenate(plot_data)
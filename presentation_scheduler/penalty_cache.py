@@ -0,0 +1,89 @@
+from collections import namedtuple
+import numpy as np
+from numba import njit
+
+# bounded cache of penalty points keyed by the fingerprint of a schedule
+# set-associative: a fingerprint can only be stored in the ways of 1 set, the least recently used way is replaced
+# stamps: time of last use of each way (0 if the way is empty)
+# statistics: clock, hits and misses
+PenaltyCache = namedtuple("PenaltyCache", ["fingerprints", "penalty_points", "stamps", "statistics"])
+
+
+# create a cache of at least capacity schedules (no. of sets is rounded up to a power of 2)
+@njit(cache=True)
+def create_cache(capacity=4096, way_no=4):
+    set_no = 1
+
+    while set_no * way_no < capacity:
+        set_no *= 2
+
+    return PenaltyCache(np.zeros((set_no, way_no), dtype=np.uint64), np.zeros((set_no, way_no), dtype=np.int64),
+                        np.zeros((set_no, way_no), dtype=np.int64), np.zeros(3, dtype=np.int64))
+
+
+# Zobrist-style key of a presentation assigned to a slot, computed by hashing instead of stored in a table
+# (splitmix64 finalizer of the pair)
+@njit(cache=True)
+def slot_key(presentation, slot):
+    key = (np.uint64(presentation) << np.uint64(32)) ^ np.uint64(slot)
+    key = (key ^ (key >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    key = (key ^ (key >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return key ^ (key >> np.uint64(31))
+
+
+# fingerprint of a schedule - XOR of the keys of all presentations and their slots
+@njit(cache=True)
+def fingerprint(presentation_slot):
+    key = np.uint64(0)
+
+    for presentation in range(presentation_slot.shape[0]):
+        key ^= slot_key(presentation, presentation_slot[presentation])
+
+    return key
+
+
+# fingerprint of a schedule after a move, updated incrementally from the fingerprint before the move
+@njit(cache=True)
+def move_fingerprint(key, presentation_slot, move, move_size):
+    for i in range(move_size):
+        presentation = move[i][0]
+        key ^= slot_key(presentation, presentation_slot[presentation]) ^ slot_key(presentation, move[i][1])
+
+    return key
+
+
+# penalty points of a fingerprint (-1 if it is not cached)
+@njit(cache=True)
+def lookup(cache, key):
+    cache_set = key & np.uint64(cache.fingerprints.shape[0] - 1)
+    cache.statistics[0] += 1
+
+    for way in range(cache.fingerprints.shape[1]):
+        if cache.stamps[cache_set][way] != 0 and cache.fingerprints[cache_set][way] == key:
+            cache.stamps[cache_set][way] = cache.statistics[0]
+            cache.statistics[1] += 1
+            return cache.penalty_points[cache_set][way]
+
+    cache.statistics[2] += 1
+    return -1
+
+
+# store penalty points of a fingerprint in an empty way or in place of the least recently used way
+@njit(cache=True)
+def store(cache, key, penalty_point):
+    cache_set = key & np.uint64(cache.fingerprints.shape[0] - 1)
+    replaced_way = 0
+
+    for way in range(cache.fingerprints.shape[1]):
+        if cache.stamps[cache_set][way] < cache.stamps[cache_set][replaced_way]:
+            replaced_way = way
+
+    cache.statistics[0] += 1
+    cache.fingerprints[cache_set][replaced_way] = key
+    cache.penalty_points[cache_set][replaced_way] = penalty_point
+    cache.stamps[cache_set][replaced_way] = cache.statistics[0]
+
+
+# hit rate of a cache
+def hit_rate(cache):
+    return cache.statistics[1] / max(cache.statistics[1] + cache.statistics[2], 1)
@@ -1,105 +1,288 @@
 import numpy as np
-from numba import njit
+from collections import namedtuple
+from numba import njit, prange, get_num_threads
+
+# breakdown of soft constraints of a schedule by supervisor, each field is an array indexed by supervisor
+# consecutive_violations: groups of consecutive presentations violating SC01, day_counts: days with presentations
+# (SC02), venue_changes: changes of venue between consecutive presentations (SC03)
+SupervisorStatistics = namedtuple("SupervisorStatistics", ["consecutive_violations", "day_counts", "venue_changes"])
 
 
 # calculate penalty points based on hard and soft constraints
 @njit(cache=True)  # decorate function to be compiled instead of interpreted, speed up code execution by 2-3 times
-def penalty(slot_presentation, presentation_presentation, presentation_supervisor, supervisor_preference):
+def penalty(presentation_slot, instance):
+    # day × time slot matrix storing venue for each presentation
+    # extra last column to handle last time slot
+    day_time_slot = np.zeros((instance.day_no, instance.time_slot_no + 1), dtype=np.int8)
+    return schedule_penalty(presentation_slot, instance, day_time_slot)
+
+
+# preallocated buffers of delta_penalty for moves of up to 2 presentations
+@njit(cache=True)
+def delta_buffers(instance):
+    return np.zeros((instance.day_no, instance.time_slot_no + 1), dtype=np.int8), np.empty(2, dtype=np.int16)
+
+
+# calculate penalty points of a schedule using a preallocated day-by-time-slot matrix
+@njit(cache=True)
+def schedule_penalty(presentation_slot, instance, day_time_slot):
     penalty_point = 0
     hc_count = 0
     sc_count = 0
-    presentation_no = slot_presentation.shape[1]
-    supervisor_no = supervisor_preference.shape[0]
-    venue_no = 4
-    time_slot_no = 15
-    day_slot_no = venue_no * time_slot_no
-    day_no = 5
-    presentation_presentation = np.copy(presentation_presentation)
-    supervisor_preference[:, 3:6].fill(0)
+    presentation_no = presentation_slot.shape[0]
+    supervisor_no = instance.supervisor_preference.shape[0]
 
     # HC02: no staff can attend more than 1 presentations concurrently
+    # each pair of presentations sharing a supervisor is counted once if both are scheduled on concurrent slots
     for presentation in range(presentation_no):
-        slot = np.where(slot_presentation[:, presentation] == 1)[0][0]
-        min_concurrent_slot = (slot % time_slot_no) + (slot // day_slot_no) * day_slot_no
-        max_concurrent_slot = min_concurrent_slot + day_slot_no
+        group = instance.slot_group[presentation_slot[presentation]]
 
-        for concurrent_slot in range(min_concurrent_slot, max_concurrent_slot, time_slot_no):
-            concurrent_presentation = np.where(slot_presentation[concurrent_slot] == 1)[0]
+        for i in range(instance.neighbour_offsets[presentation], instance.neighbour_offsets[presentation + 1]):
+            other_presentation = instance.presentation_neighbours[i]
 
-            if len(concurrent_presentation) != 0:
-                concurrent_presentation = concurrent_presentation[0]
-
-                if presentation_presentation[presentation][concurrent_presentation] == 1:
-                    presentation_presentation[presentation][concurrent_presentation] = -1
-                    presentation_presentation[concurrent_presentation][presentation] = -1
-                    penalty_point += 1000
-                    hc_count += 1
-
-    # 5(day) × 15(time slot) matrix storing venue for each presentation
-    day_time_slot = np.zeros((day_no, time_slot_no + 1), dtype=np.int8)  # extra last column to handle last time slot
+            if other_presentation > presentation and \
+                    instance.slot_group[presentation_slot[other_presentation]] == group:
+                penalty_point += 1000
+                hc_count += 1
 
     for supervisor in range(supervisor_no):  # most time-consuming loop
-        supervised_presentations = np.where(presentation_supervisor[:, supervisor] == 1)[0]
-        day_time_slot.fill(0)
-
-        for supervised_presentation in supervised_presentations:
-            supervised_slot = np.where(slot_presentation[:, supervised_presentation] == 1)[0][0]
-            supervised_day = supervised_slot // day_slot_no
-            supervised_time_slot = supervised_slot % time_slot_no
-            supervised_venue = (supervised_slot // time_slot_no) % venue_no + 1  # add 1 to avoid conflict with 0
-            day_time_slot[supervised_day][supervised_time_slot] = supervised_venue
-
-        consecutive_preference = supervisor_preference[supervisor][0]  # SC01: consecutive presentations
-        day_count = 0
-        venue_changes = 0
-
-        for day in range(day_no):
-            is_consecutive = False
-            is_this_day = False
-            consecutive_count = 0
-            previous_venue = 0
-
-            for time_slot in range(time_slot_no + 1):
-                if day_time_slot[day][time_slot] != 0:
-                    venue = day_time_slot[day][time_slot]
-
-                    # if current presentation is consecutive with previous presentation
-                    # this check is ignored if it is the first presentation of group of consecutive presentations
-                    if is_consecutive and venue != previous_venue:
-                        venue_changes += 1
-
-                    is_consecutive = True
-                    is_this_day = True
-                    consecutive_count += 1
-                    previous_venue = venue
-                else:
-                    # calculate penalty points for a group of consecutive presentations (might has only 1 presentation)
-                    if is_consecutive:
-                        if consecutive_count < consecutive_preference:  # encourage presentations to be consecutive
-                            penalty_point += (consecutive_preference - consecutive_count) * 1
-                            supervisor_preference[supervisor][3] += 1
-                        elif consecutive_count > consecutive_preference:  # exceeds maximum consecutive preference
-                            penalty_point += (consecutive_count - consecutive_preference) * 10
-                            supervisor_preference[supervisor][3] += 1
-                            sc_count += 1
-
-                    is_consecutive = False
-
-            if is_this_day:  # a presentation takes place on this day
-                day_count += 1
-
-        days_preference = supervisor_preference[supervisor][1]  # SC02: number of days
-        supervisor_preference[supervisor][4] = day_count
-
-        if day_count > days_preference:
-            penalty_point += (day_count - days_preference) * 10
-            sc_count += 1
-
-        venue_preference = supervisor_preference[supervisor][2]  # SC03: change of venue
-        supervisor_preference[supervisor][5] = venue_changes
-
-        if venue_preference == 1 and venue_changes > 0:  # supervisor does not want to change venue
-            penalty_point += venue_changes * 10
-            sc_count += 1
+        supervisor_penalty_point, supervisor_sc_count, _, _, _ = \
+            supervisor_penalty(presentation_slot, supervisor, instance, day_time_slot)
+        penalty_point += supervisor_penalty_point
+        sc_count += supervisor_sc_count
 
     return penalty_point, hc_count, sc_count
+
+
+# calculate penalty points of a population of schedules (K × presentation or K × slot × presentation)
+# returns penalty points, no. of hard constraints violated and no. of soft constraints violated of each schedule
+def batch_penalty(population, instance):
+    if population.ndim == 3:  # slot-by-presentation matrices
+        population = np.argmax(population == 1, axis=1).astype(np.int16)
+
+    return batch_penalty_kernel(population, instance, get_num_threads())
+
+
+# evaluate schedules of a population in parallel
+# the population is split into 1 contiguous chunk per thread (thread_no chunks), each thread reuses its own
+# day-by-time-slot matrix for all schedules of its chunk (no per-schedule temporaries)
+@njit(cache=True, parallel=True)
+def batch_penalty_kernel(population, instance, thread_no):
+    population_size = population.shape[0]
+    penalty_points = np.empty(population_size, dtype=np.int64)
+    hc_counts = np.empty(population_size, dtype=np.int64)
+    sc_counts = np.empty(population_size, dtype=np.int64)
+    thread_no = min(thread_no, population_size)
+    day_time_slots = np.zeros((thread_no, instance.day_no, instance.time_slot_no + 1), dtype=np.int8)
+
+    for thread in prange(thread_no):
+        for i in range(thread * population_size // thread_no, (thread + 1) * population_size // thread_no):
+            penalty_points[i], hc_counts[i], sc_counts[i] = \
+                schedule_penalty(population[i], instance, day_time_slots[thread])
+
+    return penalty_points, hc_counts, sc_counts
+
+
+# diagnostic of a schedule (such as the final schedule) - statistics of each supervisor
+# penalty evaluation only returns penalty points and counts, hence it changes nothing shared by concurrent evaluations
+@njit(cache=True)
+def supervisor_statistics(presentation_slot, instance):
+    supervisor_no = instance.supervisor_preference.shape[0]
+    consecutive_violations = np.zeros(supervisor_no, dtype=np.int32)
+    day_counts = np.zeros(supervisor_no, dtype=np.int32)
+    venue_changes = np.zeros(supervisor_no, dtype=np.int32)
+    day_time_slot = np.zeros((instance.day_no, instance.time_slot_no + 1), dtype=np.int8)
+
+    for supervisor in range(supervisor_no):
+        _, _, consecutive_violations[supervisor], day_counts[supervisor], venue_changes[supervisor] = \
+            supervisor_penalty(presentation_slot, supervisor, instance, day_time_slot)
+
+    return SupervisorStatistics(consecutive_violations, day_counts, venue_changes)
+
+
+# calculate penalty points of soft constraints (SC01, SC02 and SC03) for a supervisor
+@njit(cache=True)
+def supervisor_penalty(presentation_slot, supervisor, instance, day_time_slot):
+    penalty_point = 0
+    sc_count = 0
+    consecutive_violations = 0
+    supervisor_preference = instance.supervisor_preference
+    day_time_slot.fill(0)
+
+    for i in range(instance.supervisor_offsets[supervisor], instance.supervisor_offsets[supervisor + 1]):
+        supervised_slot = presentation_slot[instance.supervisor_presentations[i]]
+        supervised_day = instance.slot_day[supervised_slot]
+        supervised_time_slot = instance.slot_time[supervised_slot]
+        supervised_venue = instance.slot_venue[supervised_slot] + 1  # add 1 to avoid conflict with 0
+        day_time_slot[supervised_day][supervised_time_slot] = supervised_venue
+
+    consecutive_preference = supervisor_preference[supervisor][0]  # SC01: consecutive presentations
+    day_count = 0
+    venue_changes = 0
+
+    for day in range(instance.day_no):
+        is_consecutive = False
+        is_this_day = False
+        consecutive_count = 0
+        previous_venue = 0
+
+        for time_slot in range(instance.time_slot_no + 1):
+            if day_time_slot[day][time_slot] != 0:
+                venue = day_time_slot[day][time_slot]
+
+                # if current presentation is consecutive with previous presentation
+                # this check is ignored if it is the first presentation of group of consecutive presentations
+                if is_consecutive and venue != previous_venue:
+                    venue_changes += 1
+
+                is_consecutive = True
+                is_this_day = True
+                consecutive_count += 1
+                previous_venue = venue
+            else:
+                # calculate penalty points for a group of consecutive presentations (might has only 1 presentation)
+                if is_consecutive:
+                    if consecutive_count < consecutive_preference:  # encourage presentations to be consecutive
+                        penalty_point += (consecutive_preference - consecutive_count) * 1
+                        consecutive_violations += 1
+                    elif consecutive_count > consecutive_preference:  # exceeds maximum consecutive preference
+                        penalty_point += (consecutive_count - consecutive_preference) * 10
+                        consecutive_violations += 1
+                        sc_count += 1
+
+                is_consecutive = False
+
+        if is_this_day:  # a presentation takes place on this day
+            day_count += 1
+
+    days_preference = supervisor_preference[supervisor][1]  # SC02: number of days
+
+    if day_count > days_preference:
+        penalty_point += (day_count - days_preference) * 10
+        sc_count += 1
+
+    venue_preference = supervisor_preference[supervisor][2]  # SC03: change of venue
+
+    if venue_preference == 1 and venue_changes > 0:  # supervisor does not want to change venue
+        penalty_point += venue_changes * 10
+        sc_count += 1
+
+    return penalty_point, sc_count, consecutive_violations, day_count, venue_changes
+
+
+# calculate change of penalty points if the presentations of a move are assigned to their new slots
+# only the concurrent slots and supervisors of the moved presentations are evaluated
+# day_time_slot and original_slots (of at least move_size slots) are preallocated buffers reused for every move
+@njit(cache=True)
+def delta_penalty(presentation_slot, move, move_size, instance, day_time_slot, original_slots):
+    for i in range(move_size):
+        original_slots[i] = presentation_slot[move[i][0]]
+
+    penalty_point = -partial_penalty(presentation_slot, move, move_size, instance, day_time_slot)
+
+    # evaluate the move in place, then restore the original slots
+    for i in range(move_size):
+        presentation_slot[move[i][0]] = move[i][1]
+
+    penalty_point += partial_penalty(presentation_slot, move, move_size, instance, day_time_slot)
+
+    for i in range(move_size):
+        presentation_slot[move[i][0]] = original_slots[i]
+
+    return penalty_point
+
+
+# check if a presentation is one of the first presentations of a move
+@njit(cache=True)
+def is_moved(presentation, move, move_size):
+    for i in range(move_size):
+        if move[i][0] == presentation:
+            return True
+
+    return False
+
+
+# check if a supervisor supervises a presentation
+@njit(cache=True)
+def is_supervised(presentation, supervisor, instance):
+    for i in range(instance.presentation_offsets[presentation], instance.presentation_offsets[presentation + 1]):
+        if instance.presentation_supervisors[i] == supervisor:
+            return True
+
+    return False
+
+
+# calculate change of penalty points of a move given the penalty points of each supervisor before the move
+# supervisors of the moved presentations are only evaluated after the move (day_time_slot and original_slots are
+# preallocated buffers as in delta_penalty)
+@njit(cache=True)
+def cached_delta_penalty(presentation_slot, move, move_size, instance, supervisor_penalties, day_time_slot,
+                         original_slots):
+    for i in range(move_size):
+        original_slots[i] = presentation_slot[move[i][0]]
+
+    penalty_point = -concurrent_penalty(presentation_slot, move, move_size, instance)
+
+    for i in range(move_size):
+        presentation_slot[move[i][0]] = move[i][1]
+
+    penalty_point += concurrent_penalty(presentation_slot, move, move_size, instance) + \
+        moved_supervisor_penalty(presentation_slot, move, move_size, instance, day_time_slot, supervisor_penalties)
+
+    for i in range(move_size):
+        presentation_slot[move[i][0]] = original_slots[i]
+
+    return penalty_point
+
+
+# calculate penalty points contributed by the presentations of a move and their supervisors
+@njit(cache=True)
+def partial_penalty(presentation_slot, move, move_size, instance, day_time_slot):
+    return concurrent_penalty(presentation_slot, move, move_size, instance) + \
+        moved_supervisor_penalty(presentation_slot, move, move_size, instance, day_time_slot)
+
+
+# HC02: penalty points of pairs of concurrent presentations involving a moved presentation
+@njit(cache=True)
+def concurrent_penalty(presentation_slot, move, move_size, instance):
+    penalty_point = 0
+
+    for i in range(move_size):
+        presentation = move[i][0]
+        group = instance.slot_group[presentation_slot[presentation]]
+
+        for j in range(instance.neighbour_offsets[presentation], instance.neighbour_offsets[presentation + 1]):
+            other_presentation = instance.presentation_neighbours[j]
+
+            # a pair of moved presentations is counted once
+            if not is_moved(other_presentation, move, i) and \
+                    instance.slot_group[presentation_slot[other_presentation]] == group:
+                penalty_point += 1000
+
+    return penalty_point
+
+
+# SC01, SC02 and SC03: penalty points of the supervisors of the moved presentations (each supervisor is evaluated once)
+# penalty points of each supervisor before the move are subtracted if they are given
+@njit(cache=True)
+def moved_supervisor_penalty(presentation_slot, move, move_size, instance, day_time_slot, supervisor_penalties=None):
+    penalty_point = 0
+
+    for i in range(move_size):
+        presentation = move[i][0]
+
+        for j in range(instance.presentation_offsets[presentation], instance.presentation_offsets[presentation + 1]):
+            supervisor = instance.presentation_supervisors[j]
+            is_evaluated = False
+
+            for k in range(i):
+                if is_supervised(move[k][0], supervisor, instance):
+                    is_evaluated = True
+
+            if not is_evaluated:
+                penalty_point += supervisor_penalty(presentation_slot, supervisor, instance, day_time_slot)[0]
+
+                if supervisor_penalties is not None:
+                    penalty_point -= supervisor_penalties[supervisor]
+
+    return penalty_point
@@ -0,0 +1,103 @@
+from collections import namedtuple
+import penalty_cache as pc
+import numpy as np
+from numba import njit
+
+# population of a steady-state genetic algorithm which is updated in place
+# chromosomes, penalty_points and fingerprints are stored by row and never reordered
+# ranks: rows ordered by penalty points (ranks[0] is the row of the best chromosome)
+Population = namedtuple("Population", ["chromosomes", "penalty_points", "fingerprints", "ranks"])
+
+
+# create a population from chromosomes and their penalty points (in any order)
+@njit(cache=True)
+def create_population(chromosomes, penalty_points):
+    population_size = chromosomes.shape[0]
+    fingerprints = np.empty(population_size, dtype=np.uint64)
+
+    for row in range(population_size):
+        fingerprints[row] = pc.fingerprint(chromosomes[row])
+
+    return Population(np.copy(chromosomes), penalty_points.astype(np.int64), fingerprints,
+                      np.argsort(penalty_points, kind="mergesort").astype(np.int32))
+
+
+# chromosomes and penalty points ordered by penalty points
+@njit(cache=True)
+def sorted_population(population):
+    chromosomes = np.empty_like(population.chromosomes)
+    penalty_points = np.empty_like(population.penalty_points)
+
+    for rank in range(len(population.ranks)):
+        chromosomes[rank] = population.chromosomes[population.ranks[rank]]
+        penalty_points[rank] = population.penalty_points[population.ranks[rank]]
+
+    return chromosomes, penalty_points
+
+
+# first rank (up to end) whose penalty points are higher than the given penalty points
+@njit(cache=True)
+def search_rank(population, penalty_point, end):
+    low = 0
+    high = end
+
+    while low < high:
+        middle = (low + high) // 2
+
+        if population.penalty_points[population.ranks[middle]] <= penalty_point:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+# check if an identical chromosome with the same penalty points is in the population
+@njit(cache=True)
+def is_duplicate(population, chromosome, penalty_point, key):
+    rank = search_rank(population, penalty_point, len(population.ranks)) - 1
+
+    # identical chromosomes have identical penalty points, hence only ranks of equal penalty points are compared
+    while rank >= 0 and population.penalty_points[population.ranks[rank]] == penalty_point:
+        row = population.ranks[rank]
+
+        if population.fingerprints[row] == key and np.array_equal(population.chromosomes[row], chromosome):
+            return True
+
+        rank -= 1
+
+    return False
+
+
+# replace the worst chromosome with a child unless the child is worse or already in the population
+# the child is copied into the row of the worst chromosome and only the ranks behind its rank are shifted
+# returns the rank of the child (-1 if it is rejected)
+@njit(cache=True)
+def insert(population, chromosome, penalty_point):
+    last = len(population.ranks) - 1
+    worst_row = population.ranks[last]
+
+    if penalty_point > population.penalty_points[worst_row]:
+        return -1
+
+    key = pc.fingerprint(chromosome)
+
+    if is_duplicate(population, chromosome, penalty_point, key):
+        return -1
+
+    rank = search_rank(population, penalty_point, last)
+    population.chromosomes[worst_row] = chromosome
+    population.penalty_points[worst_row] = penalty_point
+    population.fingerprints[worst_row] = key
+
+    for i in range(last, rank, -1):
+        population.ranks[i] = population.ranks[i - 1]
+
+    population.ranks[rank] = worst_row
+    return rank
+
+
+# penalty points of the best chromosome
+@njit(cache=True)
+def best_penalty_point(population):
+    return population.penalty_points[population.ranks[0]]
@@ -0,0 +1,84 @@
+import data as dt
+import penalty_function as pf
+import genetic_algorithm as ga
+import simulated_annealing as sa
+import tabu_search as ts
+import penalty_cache as pc
+import schedule as sc
+import telemetry as tm
+import numpy as np
+import argparse
+from timeit import default_timer as timer
+
+
+# small instance with the same array types as instances loaded from input files
+def small_instance():
+    venue_no, time_slot_no, day_no = 2, 3, 2
+    presentation_supervisor = np.zeros([4, 3], dtype=np.int8)
+    presentation_supervisor[[0, 0, 1, 2, 3, 3], [0, 1, 1, 2, 0, 2]] = 1
+    availability = np.ones([venue_no * time_slot_no * day_no, 4], dtype=bool)
+    availability[0, :2] = False
+    supervisor_preference = np.array([[1, 1, 1], [2, 2, 0], [3, 1, 1]], dtype=np.int32)
+    return dt.build_instance(availability, presentation_supervisor, supervisor_preference,
+                             venue_no, time_slot_no, day_no)
+
+
+# compile (or load from the cache of compiled functions) the functions run by the hybrid system
+# each combination of optional arguments is a separate compiled function, hence the combination used by the run is
+# compiled: counters (with_counters), penalty caches (with_cache) and adaptive selection of neighbourhood structures
+# worker processes forked afterwards inherit the compiled functions
+# the generator of compiled functions is changed, hence it has to be seeded afterwards
+# returns the time taken in seconds
+def precompile(with_counters=False, with_cache=False, adaptive=True):
+    start = timer()
+    instance = small_instance()
+    slot_no = instance.availability.shape[0]
+    counters = tm.new_counters() if with_counters else None
+    sc.seed_compiled_random(0)
+
+    # initial population and its evaluation
+    population = np.array([ga.construct_chromosome(instance).presentation_slot for _ in range(4)])
+    penalty_points = pf.batch_penalty(population, instance)[0]
+    order = penalty_points.argsort()
+    population, penalty_points = population[order], penalty_points[order]
+
+    # genetic algorithm
+    cache = pc.create_cache(16) if with_cache else None
+    population, penalty_points, _ = \
+        ga.reproduction(2, population, penalty_points, instance, verbose=False, counters=counters, cache=cache)
+
+    # simulated annealing, chains start with the integer temperature of the population and continue with floats
+    cache = pc.create_cache(16) if with_cache else None
+    operator_quality = np.ones(tm.neighbourhood_structure_no) if adaptive else None
+    current_candidate = sc.create_schedule(population[0], slot_no)
+    best_candidate = sc.copy_schedule(current_candidate)
+    plot_data = np.empty(2, dtype=np.int64)
+    current_penalty_point, best_penalty_point, temperature = \
+        sa.anneal_chain(penalty_points[-1] - penalty_points[0] + 1, 0.9999, current_candidate, penalty_points[0],
+                        best_candidate, penalty_points[0], plot_data, 0, instance, counters, operator_quality, cache)
+    sa.anneal_chain(temperature, 0.9999, current_candidate, current_penalty_point, best_candidate,
+                    best_penalty_point, plot_data, 0, instance, counters, operator_quality, cache)
+
+    # tabu search
+    tabu_until = np.zeros((instance.availability.shape[1], slot_no), dtype=np.int32)
+    ts.tabu_chain(current_candidate, current_penalty_point, best_candidate, best_penalty_point, tabu_until, 0,
+                  plot_data, 0, instance, 20, counters)
+
+    # result data
+    pf.penalty(best_candidate.presentation_slot, instance)
+    pf.supervisor_statistics(best_candidate.presentation_slot, instance)
+    return timer() - start
+
+
+# compile functions before the first run (or check the cache of compiled functions) and report the time taken
+def main():
+    parser = argparse.ArgumentParser(description="Compile functions of the hybrid system ahead of a run")
+    parser.add_argument("--counters", action="store_true", help="compile functions collecting telemetry counters")
+    parser.add_argument("--penalty-cache", action="store_true", help="compile functions using penalty caches")
+    arguments = parser.parse_args()
+    seconds = precompile(arguments.counters, arguments.penalty_cache)
+    print("Compiled functions ready in", round(seconds, 3), "seconds")
+
+
+if __name__ == "__main__":
+    main()
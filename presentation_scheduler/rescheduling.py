@@ -0,0 +1,197 @@
+import data as dt
+import penalty_function as pf
+import schedule as sc
+import numpy as np
+import argparse
+import json
+import os
+from numba import njit
+from timeit import default_timer as timer
+
+
+# read the slot assigned to each presentation from a result file written by data.write (csv or json)
+# presentations which are not in the result are not scheduled (-1)
+def read_result(path, presentation_no, slot_no):
+    presentation_slot = np.full(presentation_no, -1, dtype=np.int16)
+
+    if path.endswith(".json"):
+        with open(path) as file:
+            assignments = [(entry["presentation"], entry["slot"] - 1) for entry in json.load(file)["schedule"]]
+    else:
+        rows = dt.read_csv(os.path.dirname(path) or ".", os.path.basename(path))
+
+        if len(rows) != slot_no:
+            raise ValueError(f"Result has {len(rows)} slots but the timetable has {slot_no} slots")
+
+        assignments = [(row[0], slot) for slot, row in enumerate(rows) if row[0] != "null"]
+
+    for code, slot in assignments:
+        presentation = dt.code_index(code)
+
+        if presentation >= presentation_no or slot >= slot_no:
+            raise ValueError(f"{code} on slot {slot + 1} is not in the problem instance")
+
+        presentation_slot[presentation] = slot
+
+    return presentation_slot
+
+
+# presentations which have to be moved: presentations which are not scheduled and presentations scheduled on slots
+# which are no longer available (changed HC03 and HC04)
+def invalidated_presentations(presentation_slot, instance):
+    presentations = np.arange(len(presentation_slot))
+    scheduled = presentation_slot != -1
+    invalidated = ~scheduled
+    invalidated[scheduled] = ~instance.availability[presentation_slot[scheduled], presentations[scheduled]]
+    return presentations[invalidated].astype(np.int16)
+
+
+# invalidated presentations and presentations sharing a supervisor with them, the only presentations which are moved
+def local_presentations(invalidated, instance):
+    neighbours = [instance.presentation_neighbours[instance.neighbour_offsets[presentation]:
+                                                   instance.neighbour_offsets[presentation + 1]]
+                  for presentation in invalidated]
+    return np.unique(np.concatenate([invalidated] + neighbours)).astype(np.int16)
+
+
+# 1 if a presentation is moved away from its slot in the previous result (0 for invalidated presentations)
+@njit(cache=True)
+def churn(presentation, slot, previous_slots):
+    return 1 if previous_slots[presentation] != -1 and slot != previous_slots[presentation] else 0
+
+
+# localized Simulated Annealing - only local presentations are moved to empty slots or swapped with each other
+# cost of a schedule is its penalty points plus churn_weight for each presentation moved away from its previous slot
+# (previous_slots of invalidated presentations are -1), hence moves must save more than their churn
+# cost of the best candidate after each iteration is stored in plot_data
+# returns the best candidate, its penalty points and its churn
+@njit(cache=True)
+def repair_anneal(candidate, penalty_point, local, previous_slots, churn_weight, initial_temperature,
+                  final_temperature, plot_data, seed, instance):
+    np.random.seed(seed)
+    iteration_no = len(plot_data)
+    alpha = (final_temperature / initial_temperature) ** (1 / max(iteration_no, 1))
+    temperature = initial_temperature * 1.0
+    move = np.empty((2, 2), dtype=np.int16)
+    day_time_slot, original_slots = pf.delta_buffers(instance)
+    local_no = len(local)
+    current_churn = 0
+
+    for presentation in range(len(previous_slots)):
+        current_churn += churn(presentation, candidate.presentation_slot[presentation], previous_slots)
+
+    best_candidate = sc.copy_schedule(candidate)
+    best_penalty_point = penalty_point
+    best_churn = current_churn
+
+    for iteration in range(iteration_no):
+        presentation1 = local[np.random.randint(local_no)]
+        slot1 = candidate.presentation_slot[presentation1]
+        move_size = 0
+
+        if local_no == 1 or np.random.random() < 0.5:
+            # move a presentation to an empty slot
+            slot = sc.random_empty_slot(candidate, instance, presentation1)
+
+            if slot != -1:
+                move[0][0], move[0][1] = presentation1, slot
+                move_size = 1
+        else:
+            # swap 2 presentations
+            presentation2 = local[np.random.randint(local_no)]
+            slot2 = candidate.presentation_slot[presentation2]
+
+            if presentation2 != presentation1 and instance.availability[slot2][presentation1] and \
+                    instance.availability[slot1][presentation2]:
+                move[0][0], move[0][1] = presentation1, slot2
+                move[1][0], move[1][1] = presentation2, slot1
+                move_size = 2
+
+        if move_size > 0:
+            difference = pf.delta_penalty(candidate.presentation_slot, move, move_size, instance, day_time_slot,
+                                          original_slots)
+            churn_difference = 0
+
+            for i in range(move_size):
+                churn_difference += churn(move[i][0], move[i][1], previous_slots) - \
+                    churn(move[i][0], candidate.presentation_slot[move[i][0]], previous_slots)
+
+            cost_difference = difference + churn_weight * churn_difference
+
+            if cost_difference < 0 or np.random.random() < np.exp(-cost_difference / temperature):
+                sc.apply_move(candidate, move, move_size)
+                penalty_point += difference
+                current_churn += churn_difference
+
+                if penalty_point + churn_weight * current_churn < best_penalty_point + churn_weight * best_churn:
+                    sc.copy_into(candidate, best_candidate)
+                    best_penalty_point = penalty_point
+                    best_churn = current_churn
+
+        temperature *= alpha
+        plot_data[iteration] = best_penalty_point + churn_weight * best_churn
+
+    return best_candidate, best_penalty_point, best_churn
+
+
+# repair a previous result of a changed problem instance
+# invalidated presentations are scheduled on random empty slots, then localized annealing moves as few other
+# presentations as possible (churn_weight penalty points per presentation moved away from its previous slot)
+# returns the repaired candidate, invalidated presentations, other presentations which are moved and the cost trace
+def reschedule(previous_slots, instance, iteration_no=200000, churn_weight=10, initial_temperature=100.0,
+               final_temperature=0.1, seed=None):
+    seed = np.random.randint(2 ** 31) if seed is None else seed
+    sc.seed_compiled_random(seed)
+    invalidated = invalidated_presentations(previous_slots, instance)
+    previous_slots = np.copy(previous_slots)
+    previous_slots[invalidated] = -1
+    candidate = sc.create_schedule(previous_slots, instance.availability.shape[0])
+
+    for presentation in invalidated:
+        slot = sc.random_empty_slot(candidate, instance, presentation)
+
+        if slot == -1:
+            raise ValueError(f"No available slot is left for presentation P{presentation + 1}")
+
+        sc.assign(candidate, presentation, slot)
+
+    plot_data = np.empty(iteration_no if len(invalidated) else 0, dtype=np.int64)
+    candidate, _, _ = repair_anneal(candidate, pf.penalty(candidate.presentation_slot, instance)[0],
+                                    local_presentations(invalidated, instance), previous_slots, churn_weight,
+                                    initial_temperature, final_temperature, plot_data, seed, instance)
+    moved = np.nonzero((previous_slots != -1) & (candidate.presentation_slot != previous_slots))[0]
+    return candidate, invalidated, moved, plot_data
+
+
+# command-line interface - repair a result after input files have changed and write the repaired result
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Repair a previous schedule after constraints have changed")
+    parser.add_argument("result", help="result file (csv or json) written by the hybrid system")
+    parser.add_argument("--input-directory", default="input_files", help="directory of changed input csv files")
+    parser.add_argument("--output-directory", default=".", help="directory of result files")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv", help="format of the schedule file")
+    parser.add_argument("--iterations", type=int, default=200000, help="iterations of localized annealing")
+    parser.add_argument("--churn-weight", type=int, default=10,
+                        help="penalty points of moving a presentation which is not invalidated")
+    parser.add_argument("--seed", type=int, help="seed of the random number generators")
+    arguments = parser.parse_args(argv)
+
+    start = timer()
+    instance = dt.load(arguments.input_directory)
+    timetable = dt.load_timetable(arguments.input_directory)
+    previous_slots = read_result(arguments.result, instance.availability.shape[1], instance.availability.shape[0])
+    candidate, invalidated, moved, plot_data = \
+        reschedule(previous_slots, instance, arguments.iterations, arguments.churn_weight, seed=arguments.seed)
+    constraint_counts = pf.penalty(candidate.presentation_slot, instance)
+    print("Invalidated presentations:", " ".join(f"P{presentation + 1}" for presentation in invalidated) or "none")
+    print("Other presentations moved:", " ".join(f"P{presentation + 1}" for presentation in moved) or "none")
+    print("[Final Penalty Points:]", constraint_counts[0], "[Hard Constraints Violated:]", constraint_counts[1],
+          "[Soft Constraints Violated:]", constraint_counts[2])
+    print("Execution Time of Rescheduling:", round(timer() - start, 2), "seconds")
+    dt.write(candidate, instance.supervisor_preference, pf.supervisor_statistics(candidate.presentation_slot, instance),
+             constraint_counts, plot_data, timetable, True, arguments.output_directory, arguments.format).join()
+    print("Result files written to", os.path.abspath(arguments.output_directory))
+
+
+if __name__ == "__main__":
+    main()
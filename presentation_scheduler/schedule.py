@@ -0,0 +1,161 @@
+from collections import namedtuple
+import numpy as np
+from numba import njit
+import telemetry as tm
+
+# compact candidate solution shared by genetic algorithm and simulated annealing
+# presentation_slot: slot assigned to each presentation (-1 if the presentation is not scheduled yet)
+# slot_occupancy: presentation assigned to each slot (-1 if the slot is empty)
+# free_slots: permutation of slots where the first free_count[0] slots are empty
+# slot_position: position of each slot in free_slots
+Schedule = namedtuple("Schedule", ["presentation_slot", "slot_occupancy", "free_slots", "slot_position",
+                                   "free_count"])
+
+
+# create an empty schedule where no presentation has been assigned to any slot
+@njit(cache=True)
+def empty_schedule(presentation_no, slot_no):
+    presentation_slot = np.full(presentation_no, -1, dtype=np.int16)
+    slot_occupancy = np.full(slot_no, -1, dtype=np.int16)
+    free_slots = np.arange(slot_no).astype(np.int16)
+    slot_position = np.arange(slot_no).astype(np.int16)
+    free_count = np.full(1, slot_no, dtype=np.int32)
+    return Schedule(presentation_slot, slot_occupancy, free_slots, slot_position, free_count)
+
+
+# create a schedule from the slot assigned to each presentation
+@njit(cache=True)
+def create_schedule(presentation_slot, slot_no):
+    schedule = empty_schedule(len(presentation_slot), slot_no)
+
+    for presentation in range(len(presentation_slot)):
+        if presentation_slot[presentation] != -1:
+            assign(schedule, presentation, presentation_slot[presentation])
+
+    return schedule
+
+
+# copy a schedule (a few hundred bytes instead of the whole slot-by-presentation matrix)
+@njit(cache=True)
+def copy_schedule(schedule):
+    return Schedule(np.copy(schedule.presentation_slot), np.copy(schedule.slot_occupancy),
+                    np.copy(schedule.free_slots), np.copy(schedule.slot_position), np.copy(schedule.free_count))
+
+
+# overwrite a schedule with another schedule of the same instance without allocating
+@njit(cache=True)
+def copy_into(source, target):
+    target.presentation_slot[:] = source.presentation_slot
+    target.slot_occupancy[:] = source.slot_occupancy
+    target.free_slots[:] = source.free_slots
+    target.slot_position[:] = source.slot_position
+    target.free_count[:] = source.free_count
+
+
+# exchange the positions of 2 slots in the permutation of free slots
+@njit(cache=True)
+def exchange_positions(schedule, slot1, slot2):
+    position1 = schedule.slot_position[slot1]
+    position2 = schedule.slot_position[slot2]
+    schedule.free_slots[position1], schedule.free_slots[position2] = slot2, slot1
+    schedule.slot_position[slot1], schedule.slot_position[slot2] = position2, position1
+
+
+# assign an unscheduled presentation to an empty slot
+@njit(cache=True)
+def assign(schedule, presentation, slot):
+    schedule.presentation_slot[presentation] = slot
+    schedule.slot_occupancy[slot] = presentation
+
+    # move the slot behind the last free slot
+    schedule.free_count[0] -= 1
+    exchange_positions(schedule, slot, schedule.free_slots[schedule.free_count[0]])
+
+
+# remove a presentation from its slot
+@njit(cache=True)
+def unassign(schedule, presentation):
+    slot = schedule.presentation_slot[presentation]
+    schedule.presentation_slot[presentation] = -1
+    schedule.slot_occupancy[slot] = -1
+
+    # move the slot next to the last free slot
+    exchange_positions(schedule, slot, schedule.free_slots[schedule.free_count[0]])
+    schedule.free_count[0] += 1
+
+
+# move a presentation to an empty slot
+@njit(cache=True)
+def move(schedule, presentation, slot):
+    unassign(schedule, presentation)
+    assign(schedule, presentation, slot)
+
+
+# interchange the slots of 2 presentations (the set of free slots remains the same)
+@njit(cache=True)
+def swap(schedule, presentation1, presentation2):
+    slot1 = schedule.presentation_slot[presentation1]
+    slot2 = schedule.presentation_slot[presentation2]
+    schedule.presentation_slot[presentation1], schedule.presentation_slot[presentation2] = slot2, slot1
+    schedule.slot_occupancy[slot1], schedule.slot_occupancy[slot2] = presentation2, presentation1
+
+
+# assign the presentations of a move (rows of presentation and new slot) to their new slots
+@njit(cache=True)
+def apply_move(schedule, move, move_size):
+    # remove all moved presentations first so that presentations can exchange slots
+    for i in range(move_size):
+        unassign(schedule, move[i][0])
+
+    for i in range(move_size):
+        assign(schedule, move[i][0], move[i][1])
+
+
+# seed the random number generator of compiled functions, which is separate from NumPy's global generator
+@njit(cache=True)
+def seed_compiled_random(seed):
+    np.random.seed(seed)
+
+
+# sample a random empty slot which is available for a presentation (-1 if there is no such slot)
+# samples from the smaller of the free slots and the feasible slots of the presentation,
+# hence a few tries are enough whatever the number of scheduled presentations
+@njit(cache=True)
+def random_empty_slot(schedule, instance, presentation, counters=None):
+    first = instance.feasible_offsets[presentation]
+    feasible_no = instance.feasible_offsets[presentation + 1] - first
+    free_no = schedule.free_count[0]
+    max_tries = 32
+
+    if feasible_no == 0 or free_no == 0:
+        return -1
+
+    for _ in range(max_tries):
+        if free_no <= feasible_no:
+            slot = schedule.free_slots[np.random.randint(free_no)]
+
+            if instance.availability[slot][presentation]:
+                return slot
+        else:
+            slot = instance.feasible_slots[first + np.random.randint(feasible_no)]
+
+            if schedule.slot_occupancy[slot] == -1:
+                return slot
+
+        if counters is not None:
+            counters[tm.random_slot_misses] += 1
+
+    # few slots are both empty and available, hence sample uniformly from a scan of the smaller set
+    chosen_slot = -1
+    count = 0
+
+    for i in range(min(free_no, feasible_no)):
+        slot = schedule.free_slots[i] if free_no <= feasible_no else instance.feasible_slots[first + i]
+
+        if instance.availability[slot][presentation] and schedule.slot_occupancy[slot] == -1:
+            count += 1
+
+            if np.random.randint(count) == 0:
+                chosen_slot = slot
+
+    return chosen_slot
@@ -1,153 +1,221 @@
-from penalty_function import penalty
+from penalty_function import delta_penalty, delta_buffers
+import schedule as sc
+import telemetry as tm
+import penalty_cache as pc
 import numpy as np
 from numba import njit
 
 
+# each neighbourhood structure proposes a move without changing the candidate
+# a move stores rows of (presentation, new slot) and the number of moved presentations is returned
+# rejected proposals are counted as rejection spins of the neighbourhood structure
+# a structure which finds no move in max_attempts proposals (e.g. structure 2 on an instance of 1 venue) returns an
+# empty move of 0 presentations, which leaves the candidate unchanged
+max_attempts = 1000
+
+
 # interchange two slots of a professor
 @njit(cache=True)
-def neighbourhood_structure1(candidate, presentation_supervisor):
-    supervisor_no = presentation_supervisor.shape[1]
+def neighbourhood_structure1(candidate, move, instance, counters=None):
+    supervisor_no = instance.supervisor_preference.shape[0]
 
-    while True:
+    for _ in range(max_attempts):
         random_supervisor = np.random.randint(supervisor_no)
-        supervised_presentations = np.where(presentation_supervisor[:, random_supervisor] == 1)[0]
+        first = instance.supervisor_offsets[random_supervisor]
+        supervised_presentation_no = instance.supervisor_offsets[random_supervisor + 1] - first
 
-        if len(supervised_presentations) > 1:
+        if supervised_presentation_no > 1:
             # get 2 random presentations supervised by the supervisor
-            presentation1 = supervised_presentations[np.random.randint(len(supervised_presentations))]
-            slot1 = np.where(candidate[:, presentation1] == 1)[0][0]
-            presentation2 = supervised_presentations[np.random.randint(len(supervised_presentations))]
-            slot2 = np.where(candidate[:, presentation2] == 1)[0][0]
+            presentation1 = instance.supervisor_presentations[first + np.random.randint(supervised_presentation_no)]
+            slot1 = candidate.presentation_slot[presentation1]
+            presentation2 = instance.supervisor_presentations[first + np.random.randint(supervised_presentation_no)]
+            slot2 = candidate.presentation_slot[presentation2]
 
             # interchange the slots of the two presentations
-            if candidate[slot2][presentation1] == 0 and candidate[slot1][presentation2] == 0:
-                candidate[slot1][presentation1] = candidate[slot2][presentation2] = 0
-                candidate[slot2][presentation1] = candidate[slot1][presentation2] = 1
-                break
+            if presentation1 != presentation2 and instance.availability[slot2][presentation1] and \
+                    instance.availability[slot1][presentation2]:
+                move[0][0], move[0][1] = presentation1, slot2
+                move[1][0], move[1][1] = presentation2, slot1
+                return 2
+
+        if counters is not None:
+            counters[tm.rejection_spins] += 1
+
+    return 0
 
 
 # change venue of presentation (time-slot remains the same)
 @njit(cache=True)
-def neighbourhood_structure2(candidate):
-    presentation_no = candidate.shape[1]
-    venue_no = 4
-    time_slot_no = 15
-    day_slot_no = venue_no * time_slot_no
+def neighbourhood_structure2(candidate, move, instance, counters=None):
+    presentation_no = candidate.presentation_slot.shape[0]
 
-    while True:
+    for _ in range(max_attempts):
         random_presentation = np.random.randint(presentation_no)
-        slot = np.where(candidate[:, random_presentation] == 1)[0][0]
-        min_concurrent_slot = (slot % time_slot_no) + (slot // day_slot_no) * day_slot_no
-        max_concurrent_slot = min_concurrent_slot + day_slot_no
+        slot = candidate.presentation_slot[random_presentation]
 
         # find a concurrent slot that is available and empty
-        for concurrent_slot in range(min_concurrent_slot, max_concurrent_slot, time_slot_no):
-            if candidate[concurrent_slot][random_presentation] == 0 and \
-                    np.count_nonzero(candidate[concurrent_slot] == 1) == 0:
-                candidate[slot][random_presentation] = 0
-                candidate[concurrent_slot][random_presentation] = 1
-                return
+        for concurrent_slot in instance.concurrent_slots[instance.slot_group[slot]]:
+            if instance.availability[concurrent_slot][random_presentation] and \
+                    candidate.slot_occupancy[concurrent_slot] == -1:
+                move[0][0], move[0][1] = random_presentation, concurrent_slot
+                return 1
+
+        if counters is not None:
+            counters[tm.rejection_spins + 1] += 1
+
+    return 0
 
 
 # assign presentation to a random empty slot
 @njit(cache=True)
-def neighbourhood_structure3(candidate):
-    slot_no = candidate.shape[0]
-    presentation_no = candidate.shape[1]
-    random_presentation = np.random.randint(presentation_no)
-    original_slot = np.where(candidate[:, random_presentation] == 1)[0][0]
+def neighbourhood_structure3(candidate, move, instance, counters=None):
+    presentation_no = candidate.presentation_slot.shape[0]
+
+    for _ in range(max_attempts):
+        random_presentation = np.random.randint(presentation_no)
+        # a random slot which is available and empty (other presentations are not using the slot)
+        random_slot = sc.random_empty_slot(candidate, instance, random_presentation, counters)
+
+        if random_slot != -1:
+            move[0][0], move[0][1] = random_presentation, random_slot
+            return 1
 
-    while True:
-        random_slot = np.random.randint(slot_no)
+        if counters is not None:
+            counters[tm.rejection_spins + 2] += 1
 
-        # if the slot is available and empty (other presentations are not using the slot)
-        if candidate[random_slot][random_presentation] == 0 and np.count_nonzero(candidate[random_slot] == 1) == 0:
-            candidate[original_slot][random_presentation] = 0
-            candidate[random_slot][random_presentation] = 1
-            break
+    return 0
 
 
 # find a random presentation and assign a presentation that has the same supervisor
 # to the slot next to the random presentation
 # aims to increase the number of consecutive presentations
 @njit(cache=True)
-def neighbourhood_structure4(candidate, presentation_presentation):
-    presentation_no = candidate.shape[1]
-    venue_no = 4
-    time_slot_no = 15
-    day_slot_no = venue_no * time_slot_no
+def neighbourhood_structure4(candidate, move, instance, counters=None):
+    slot_no = candidate.slot_occupancy.shape[0]
+    presentation_no = candidate.presentation_slot.shape[0]
+    venue_no = instance.venue_no
 
-    while True:
+    for _ in range(max_attempts):
         current_presentation = np.random.randint(presentation_no)
-        current_slot = np.where(candidate[:, current_presentation] == 1)[0][0]
-        adjacent_slot = (current_slot - 1) % 300 if np.random.random() < 0.5 else (current_slot + 1) % 300
+        current_slot = candidate.presentation_slot[current_presentation]
+        adjacent_slot = (current_slot - 1) % slot_no if np.random.random() < 0.5 else (current_slot + 1) % slot_no
+        concurrent_slots = instance.concurrent_slots[instance.slot_group[adjacent_slot]]
 
         # find all time slots after the current slot
         # the slot with the same venue as the current slot is given priority
-        min_concurrent_slot = (adjacent_slot % time_slot_no) + (adjacent_slot // day_slot_no) * day_slot_no
-        max_concurrent_slot = min_concurrent_slot + day_slot_no
-        adjacent_concurrent_slots = [adjacent_slot]
+        for venue in range(-1, venue_no):
+            adjacent_concurrent_slot = adjacent_slot if venue == -1 else concurrent_slots[venue]
 
-        for concurrent_slot in range(min_concurrent_slot, max_concurrent_slot, time_slot_no):
-            if concurrent_slot != adjacent_slot:
-                adjacent_concurrent_slots.append(concurrent_slot)
+            if venue != -1 and adjacent_concurrent_slot == adjacent_slot:
+                continue
 
-        for adjacent_concurrent_slot in adjacent_concurrent_slots:
-            # check if the slot is available (if the slot is unavailable, the row is all -1)
-            if np.all(candidate[adjacent_concurrent_slot]):
+            # check if the slot is available (if the slot is unavailable, no presentation can use the slot)
+            if not instance.open_slots[adjacent_concurrent_slot]:
                 continue
 
             # check if the slot is empty
-            if np.count_nonzero(candidate[adjacent_concurrent_slot] == 1) == 0:
-                overlapping_presentations = np.where(presentation_presentation[current_presentation])[0]
+            if candidate.slot_occupancy[adjacent_concurrent_slot] == -1:
+                first = instance.neighbour_offsets[current_presentation]
+                overlapping_presentation_no = instance.neighbour_offsets[current_presentation + 1] - first
+
+                if overlapping_presentation_no > 0:
+                    chosen_presentation = \
+                        instance.presentation_neighbours[first + np.random.randint(overlapping_presentation_no)]
+
+                    if instance.availability[adjacent_concurrent_slot][chosen_presentation]:
+                        move[0][0], move[0][1] = chosen_presentation, adjacent_concurrent_slot
+                        return 1
+
+        if counters is not None:
+            counters[tm.rejection_spins + 3] += 1
 
-                if len(overlapping_presentations) > 0:
-                    chosen_presentation = overlapping_presentations[np.random.randint(len(overlapping_presentations))]
+    return 0
 
-                    if candidate[adjacent_concurrent_slot][chosen_presentation] == 0:
-                        original_slot = np.where(candidate[:, chosen_presentation] == 1)[0][0]
-                        candidate[original_slot][chosen_presentation] = 0
-                        candidate[adjacent_concurrent_slot][chosen_presentation] = 1
-                        return
+
+# propose a move using one of the neighbourhood structures
+@njit(cache=True)
+def neighbourhood_move(neighbourhood_structure, candidate, move, instance, counters=None):
+    if counters is not None:
+        counters[tm.moves_tried + neighbourhood_structure] += 1
+
+    if neighbourhood_structure == 0:
+        return neighbourhood_structure1(candidate, move, instance, counters)
+    elif neighbourhood_structure == 1:
+        return neighbourhood_structure2(candidate, move, instance, counters)
+    elif neighbourhood_structure == 2:
+        return neighbourhood_structure3(candidate, move, instance, counters)
+    else:
+        return neighbourhood_structure4(candidate, move, instance, counters)
+
+
+# number of iterations until temperature drops below the final temperature
+@njit(cache=True)
+def iteration_count(initial_temperature, final_temperature, alpha):
+    temperature = initial_temperature * 1.0
+    count = 0
+
+    if temperature <= 0:  # population has converged, hence there is nothing to anneal
+        return count
+
+    while temperature >= final_temperature:
+        temperature *= alpha
+        count += 1
+
+    return count
 
 
 # Simulated-Annealing Algorithm - perform random walk in space until temperature drops below a limit
-def anneal(initial_temperature, initial_candidate, penalty_point, presentation_presentation,
-           presentation_supervisor, supervisor_preference):
+# the compiled mode runs the whole loop in anneal_kernel and is reproducible given a seed,
+# it can select neighbourhood structures adaptively instead of uniformly
+def anneal(initial_temperature, initial_candidate, penalty_point, instance, compiled=False, seed=None,
+           counters=None, adaptive=False):
+    if compiled:
+        if seed is None:
+            seed = np.random.randint(2 ** 31)
+
+        operator_quality = np.ones(4) if adaptive else None
+        best_candidate, best_penalty_point, plot_data = \
+            anneal_kernel(initial_temperature, initial_candidate, penalty_point, seed, instance, counters,
+                          operator_quality)
+        print("[Iteration ", 100 + len(plot_data), "] Penalty Point: ", best_penalty_point, sep="")
+        return best_candidate, best_penalty_point, plot_data
+
     temperature = initial_temperature
     final_temperature = 0.0001 * initial_temperature
     alpha = 0.9999  # annealing schedule to decrease temperature
-    current_candidate = initial_candidate
+    current_candidate = sc.copy_schedule(initial_candidate)  # current candidate is changed in place
     best_candidate = initial_candidate
     current_penalty_point = penalty_point
     best_penalty_point = penalty_point
     iteration = 100  # initial iteration after performing genetic algorithm
     neighbourhood_structure_no = 4
     plot_data = []
+    move = np.empty((2, 2), dtype=np.int16)
+    day_time_slot, original_slots = delta_buffers(instance)
 
     while temperature >= final_temperature:
-        new_candidate = np.copy(current_candidate)
         neighbourhood_structure = np.random.randint(neighbourhood_structure_no)
+        move_size = neighbourhood_move(neighbourhood_structure, current_candidate, move, instance, counters)
 
-        if neighbourhood_structure == 0:
-            neighbourhood_structure1(new_candidate, presentation_supervisor)
-        elif neighbourhood_structure == 1:
-            neighbourhood_structure2(new_candidate)
-        elif neighbourhood_structure == 2:
-            neighbourhood_structure3(new_candidate)
-        else:
-            neighbourhood_structure4(new_candidate, presentation_presentation)
-
-        new_penalty_point = \
-            penalty(new_candidate, presentation_presentation, presentation_supervisor, supervisor_preference)[0]
-        difference = new_penalty_point - current_penalty_point
+        # only the change of penalty points caused by the move is evaluated
+        difference = delta_penalty(current_candidate.presentation_slot, move, move_size, instance, day_time_slot,
+                                   original_slots)
 
         if difference < 0 or np.random.random() < np.exp((-1 * difference) / temperature):
-            current_candidate = new_candidate
-            current_penalty_point = new_penalty_point
+            sc.apply_move(current_candidate, move, move_size)
+            current_penalty_point += difference
+
+            if counters is not None:
+                counters[tm.moves_accepted + neighbourhood_structure] += 1
+
+        if counters is not None:
+            counters[tm.delta_evaluations] += 1
+
+            if difference < 0:
+                counters[tm.moves_improving + neighbourhood_structure] += 1
 
         if current_penalty_point < best_penalty_point:
-            best_candidate = current_candidate
+            best_candidate = sc.copy_schedule(current_candidate)
             best_penalty_point = current_penalty_point
 
         temperature *= alpha
@@ -158,3 +226,136 @@ def anneal(initial_temperature, initial_candidate, penalty_point, presentation_p
             print("[Iteration ", iteration, "] Penalty Point: ", best_penalty_point, sep="")
 
     return best_candidate, best_penalty_point, plot_data
+
+
+# whole Simulated-Annealing loop compiled without interpreter overhead
+# penalty points of the best candidate after each iteration are stored in a preallocated trace
+# neighbourhood structures are selected adaptively if the quality of each structure is given
+@njit(cache=True)
+def anneal_kernel(initial_temperature, initial_candidate, penalty_point, seed, instance, counters=None,
+                  operator_quality=None):
+    final_temperature = 0.0001 * initial_temperature
+    alpha = 0.9999  # annealing schedule to decrease temperature
+    current_candidate = sc.copy_schedule(initial_candidate)  # current candidate is changed in place
+    best_candidate = sc.copy_schedule(initial_candidate)
+    plot_data = np.empty(iteration_count(initial_temperature, final_temperature, alpha), dtype=np.int64)
+    _, best_penalty_point, _ = \
+        anneal_chain(initial_temperature, alpha, current_candidate, penalty_point, best_candidate, penalty_point,
+                     plot_data, seed, instance, counters, operator_quality)
+    return best_candidate, best_penalty_point, plot_data
+
+
+# adaptive operator selection - select a neighbourhood structure by probability matching
+# each structure keeps a minimum probability so that structures which were unproductive are tried again
+@njit(cache=True)
+def select_neighbourhood_structure(operator_quality):
+    neighbourhood_structure_no = len(operator_quality)
+    minimum_probability = 0.05
+    total_quality = operator_quality.sum()
+
+    if total_quality <= 0:
+        return np.random.randint(neighbourhood_structure_no)
+
+    random_number = np.random.random()
+
+    for neighbourhood_structure in range(neighbourhood_structure_no - 1):
+        random_number -= minimum_probability + (1 - neighbourhood_structure_no * minimum_probability) * \
+            operator_quality[neighbourhood_structure] / total_quality
+
+        if random_number < 0:
+            return neighbourhood_structure
+
+    return neighbourhood_structure_no - 1
+
+
+# credit assignment - quality of a neighbourhood structure is a moving average of improvements per proposal
+# (rejected proposals of the structure are included in its cost)
+@njit(cache=True)
+def update_operator_quality(operator_quality, neighbourhood_structure, difference, cost):
+    learning_rate = 0.01
+    reward = (1.0 if difference < 0 else 0.0) / cost
+    operator_quality[neighbourhood_structure] += learning_rate * (reward - operator_quality[neighbourhood_structure])
+
+
+# run a chain of Simulated Annealing for as many iterations as the length of plot_data
+# current and best candidates are changed in place, a constant temperature is kept if alpha is 1
+# neighbourhood structures are selected uniformly, or adaptively if the quality of each structure is given
+# (operator_quality is changed in place so that it can be carried over to the next chain)
+# moves to schedules in the penalty cache (if it is given) are not evaluated again
+# returns penalty points of current and best candidates and the temperature to continue the chain with
+@njit(cache=True)
+def anneal_chain(temperature, alpha, current_candidate, current_penalty_point, best_candidate, best_penalty_point,
+                 plot_data, seed, instance, counters=None, operator_quality=None, cache=None):
+    np.random.seed(seed)
+    temperature = temperature * 1.0
+    neighbourhood_structure_no = 4
+    move = np.empty((2, 2), dtype=np.int16)
+    day_time_slot, original_slots = delta_buffers(instance)
+    proposal_counters = np.zeros(tm.counter_no, dtype=np.int64)  # cost of proposals of adaptive selection
+
+    if counters is not None:  # no. of counters of a cached function may be out of date
+        proposal_counters = np.zeros_like(counters)
+
+    if cache is not None:
+        key = pc.fingerprint(current_candidate.presentation_slot)
+        pc.store(cache, key, current_penalty_point)
+
+    for iteration in range(len(plot_data)):
+        if operator_quality is not None:
+            neighbourhood_structure = select_neighbourhood_structure(operator_quality)
+            spins = proposal_counters[tm.rejection_spins + neighbourhood_structure]
+            move_size = \
+                neighbourhood_move(neighbourhood_structure, current_candidate, move, instance, proposal_counters)
+            cost = 1 + proposal_counters[tm.rejection_spins + neighbourhood_structure] - spins
+        else:
+            neighbourhood_structure = np.random.randint(neighbourhood_structure_no)
+            move_size = neighbourhood_move(neighbourhood_structure, current_candidate, move, instance, counters)
+
+        if cache is not None:
+            # fingerprint of the schedule after the move
+            move_key = pc.move_fingerprint(key, current_candidate.presentation_slot, move, move_size)
+            cached_penalty_point = pc.lookup(cache, move_key)
+
+            if cached_penalty_point == -1:
+                difference = delta_penalty(current_candidate.presentation_slot, move, move_size, instance,
+                                           day_time_slot, original_slots)
+                pc.store(cache, move_key, current_penalty_point + difference)
+
+                if counters is not None:
+                    counters[tm.delta_evaluations] += 1
+            else:
+                difference = cached_penalty_point - current_penalty_point
+        else:
+            difference = delta_penalty(current_candidate.presentation_slot, move, move_size, instance, day_time_slot,
+                                       original_slots)
+
+            if counters is not None:
+                counters[tm.delta_evaluations] += 1
+
+        if operator_quality is not None:
+            update_operator_quality(operator_quality, neighbourhood_structure, difference, cost)
+
+        if difference < 0 or np.random.random() < np.exp((-1 * difference) / temperature):
+            sc.apply_move(current_candidate, move, move_size)
+            current_penalty_point += difference
+
+            if cache is not None:
+                key = move_key
+
+            if counters is not None:
+                counters[tm.moves_accepted + neighbourhood_structure] += 1
+
+        if counters is not None and difference < 0:
+            counters[tm.moves_improving + neighbourhood_structure] += 1
+
+        if current_penalty_point < best_penalty_point:
+            sc.copy_into(current_candidate, best_candidate)
+            best_penalty_point = current_penalty_point
+
+        temperature *= alpha
+        plot_data[iteration] = best_penalty_point
+
+    if counters is not None and operator_quality is not None:
+        counters[:] += proposal_counters
+
+    return current_penalty_point, best_penalty_point, temperature
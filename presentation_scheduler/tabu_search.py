@@ -0,0 +1,216 @@
+from penalty_function import cached_delta_penalty, supervisor_penalty, delta_buffers
+import schedule as sc
+import telemetry as tm
+import termination as tn
+import numpy as np
+from numba import njit
+from timeit import default_timer as timer
+
+
+# check if a move assigns a presentation to a slot which it left recently (tabu_until stores the iteration until
+# which each presentation may not return to each slot)
+@njit(cache=True)
+def is_tabu(move, move_size, tabu_until, iteration):
+    for i in range(move_size):
+        if tabu_until[move[i][0]][move[i][1]] > iteration:
+            return True
+
+    return False
+
+
+# add a move of a presentation to a slot (a swap if the slot is occupied) to a candidate list if it is feasible
+# returns the number of moves of the candidate list
+@njit(cache=True)
+def add_move(candidate, presentation, slot, instance, moves, move_sizes, move_no):
+    other_presentation = candidate.slot_occupancy[slot]
+    presentation_slot = candidate.presentation_slot[presentation]
+
+    if other_presentation == presentation or not instance.availability[slot][presentation]:
+        return move_no
+
+    if other_presentation == -1:
+        moves[move_no][0][0], moves[move_no][0][1] = presentation, slot
+        move_sizes[move_no] = 1
+    elif instance.availability[presentation_slot][other_presentation]:
+        moves[move_no][0][0], moves[move_no][0][1] = presentation, slot
+        moves[move_no][1][0], moves[move_no][1][1] = other_presentation, presentation_slot
+        move_sizes[move_no] = 2
+    else:
+        return move_no
+
+    return move_no + 1
+
+
+# candidate list of a supervisor: each presentation of the supervisor is moved to another venue at the same time
+# (SC03), or next to another presentation of the supervisor in the same venue (SC01 and SC02), swapping with the
+# presentation on the slot if it is occupied, hence these are the moves of neighbourhood structures 1, 2 and 4 aimed
+# at the supervisor (moves next to a presentation in another venue would change venue, hence they are left out to
+# keep the list short)
+# returns the number of moves
+@njit(cache=True)
+def supervisor_moves(candidate, supervisor, instance, moves, move_sizes):
+    move_no = 0
+    first, last = instance.supervisor_offsets[supervisor], instance.supervisor_offsets[supervisor + 1]
+
+    for i in range(first, last):
+        presentation = instance.supervisor_presentations[i]
+
+        for j in range(first, last):
+            other_slot = candidate.presentation_slot[instance.supervisor_presentations[j]]
+            group = instance.slot_group[other_slot]
+
+            for step in (-1, 0, 1):
+                # concurrent slots of the presentation itself, adjacent time slots of other presentations
+                if (step == 0) != (i == j) or not 0 <= instance.slot_time[other_slot] + step < instance.time_slot_no:
+                    continue
+
+                if step == 0:
+                    for slot in instance.concurrent_slots[group]:
+                        move_no = add_move(candidate, presentation, slot, instance, moves, move_sizes, move_no)
+                else:
+                    slot = instance.concurrent_slots[group + step][instance.slot_venue[other_slot]]
+                    move_no = add_move(candidate, presentation, slot, instance, moves, move_sizes, move_no)
+
+    return move_no
+
+
+# run Tabu Search for as many iterations as the length of plot_data
+# in each iteration, the candidate list of a random supervisor with penalty points is evaluated and the best move
+# which is not tabu is applied even if it worsens the current candidate
+# penalty points of each supervisor are kept up to date, hence supervisors are only evaluated after each move
+# aspiration criterion: a tabu move is allowed if it leads to a candidate better than the best candidate
+# after a move, returning its presentations to their previous slots is tabu for tenure to 2 * tenure iterations
+# current and best candidates and the tabu memory are changed in place, iteration is the number of iterations so far
+# returns penalty points of current and best candidates
+@njit(cache=True)
+def tabu_chain(current_candidate, current_penalty_point, best_candidate, best_penalty_point, tabu_until, iteration,
+               plot_data, seed, instance, tenure=20, counters=None):
+    np.random.seed(seed)
+    supervisor_no = instance.supervisor_preference.shape[0]
+    day_time_slot, original_slots = delta_buffers(instance)
+    supervisor_penalties = np.empty(supervisor_no, dtype=np.int64)
+
+    for supervisor in range(supervisor_no):
+        supervisor_penalties[supervisor] = \
+            supervisor_penalty(current_candidate.presentation_slot, supervisor, instance, day_time_slot)[0]
+
+    supervised_counts = instance.supervisor_offsets[1:] - instance.supervisor_offsets[:-1]
+    moves = np.empty((supervised_counts.max() * (2 * supervised_counts.max() + instance.venue_no), 2, 2),
+                     dtype=np.int16)
+    move_sizes = np.empty(len(moves), dtype=np.int64)
+
+    for step in range(len(plot_data)):
+        # a random supervisor with penalty points of soft constraints (any supervisor if there is none)
+        focus = np.random.randint(supervisor_no)
+
+        for _ in range(supervisor_no):
+            if supervisor_penalties[focus] > 0:
+                break
+
+            focus = np.random.randint(supervisor_no)
+
+        move_no = supervisor_moves(current_candidate, focus, instance, moves, move_sizes)
+        chosen_move = -1
+        chosen_difference = 0
+        tie_count = 0
+
+        # evaluate the candidate list, ties between the best moves are broken randomly
+        for i in range(move_no):
+            difference = cached_delta_penalty(current_candidate.presentation_slot, moves[i], move_sizes[i], instance,
+                                              supervisor_penalties, day_time_slot, original_slots)
+
+            if chosen_move != -1 and difference > chosen_difference:
+                continue
+
+            aspiration = current_penalty_point + difference < best_penalty_point
+
+            if not aspiration and is_tabu(moves[i], move_sizes[i], tabu_until, iteration + step):
+                continue
+
+            tie_count = 1 if chosen_move == -1 or difference < chosen_difference else tie_count + 1
+
+            if np.random.randint(tie_count) == 0:
+                chosen_move, chosen_difference = i, difference
+
+        if counters is not None:
+            counters[tm.tabu_evaluations] += move_no
+
+        if chosen_move != -1:
+            if counters is not None and is_tabu(moves[chosen_move], move_sizes[chosen_move], tabu_until,
+                                                iteration + step):
+                counters[tm.tabu_aspirations] += 1
+
+            for i in range(move_sizes[chosen_move]):
+                presentation = moves[chosen_move][i][0]
+                tabu_until[presentation][current_candidate.presentation_slot[presentation]] = \
+                    iteration + step + tenure + np.random.randint(tenure + 1)
+
+            sc.apply_move(current_candidate, moves[chosen_move], move_sizes[chosen_move])
+            current_penalty_point += chosen_difference
+
+            for i in range(move_sizes[chosen_move]):
+                presentation = moves[chosen_move][i][0]
+
+                for j in range(instance.presentation_offsets[presentation],
+                               instance.presentation_offsets[presentation + 1]):
+                    supervisor = instance.presentation_supervisors[j]
+                    supervisor_penalties[supervisor] = \
+                        supervisor_penalty(current_candidate.presentation_slot, supervisor, instance,
+                                           day_time_slot)[0]
+
+            if current_penalty_point < best_penalty_point:
+                sc.copy_into(current_candidate, best_candidate)
+                best_penalty_point = current_penalty_point
+
+        plot_data[step] = best_penalty_point
+
+    return current_penalty_point, best_penalty_point
+
+
+# Tabu Search - intensify the search around the best candidate of simulated annealing
+# runs segments of compiled iterations until iteration_no iterations, or until the best candidate has not improved
+# in stall_limit iterations (stopping criteria of the run are checked between segments)
+# returns the best candidate, its penalty points and penalty points of the best candidate after each iteration
+def tabu_search(candidate, penalty_point, instance, iteration_no=1000, tenure=20, stall_limit=1000,
+                seed=None, telemetry=None, termination=None, segment_size=100):
+    seed = np.random.randint(2 ** 31) if seed is None else seed
+    presentation_no, slot_no = candidate.presentation_slot.shape[0], candidate.slot_occupancy.shape[0]
+    current_candidate = sc.copy_schedule(candidate)
+    best_candidate = sc.copy_schedule(candidate)
+    current_penalty_point = best_penalty_point = penalty_point
+    tabu_until = np.zeros((presentation_no, slot_no), dtype=np.int32)
+    counters = tm.counters_of(telemetry)
+    iteration = last_improvement = 0
+    plot_data = []
+
+    while iteration < iteration_no and iteration - last_improvement < stall_limit:
+        reason = tn.stop_reason(termination, best_penalty_point, best_candidate.presentation_slot, instance, plot_data)
+
+        if reason is not None:
+            tm.record(telemetry, "termination", phase="tabu", reason=reason, iteration=iteration)
+            break
+
+        trace = np.empty(min(segment_size, iteration_no - iteration), dtype=np.int64)
+        previous_best_penalty_point = best_penalty_point
+        current_penalty_point, best_penalty_point = \
+            tabu_chain(current_candidate, current_penalty_point, best_candidate, best_penalty_point, tabu_until,
+                       iteration, trace, seed + iteration, instance, tenure, counters)
+
+        if best_penalty_point < previous_best_penalty_point:
+            last_improvement = iteration + int(np.argmax(trace == best_penalty_point)) + 1
+
+        plot_data.append(trace)
+        iteration += len(trace)
+        tm.record(telemetry, "progress", phase="tabu", iteration=iteration, penalty_point=int(best_penalty_point))
+
+    plot_data = np.concatenate(plot_data) if plot_data else np.empty(0, dtype=np.int64)
+    return best_candidate, best_penalty_point, plot_data
+
+
+# seconds of iteration_no iterations of tabu search from a candidate, estimated from the time of a few iterations
+# (probe_iteration_no) run on a copy of the candidate
+def estimate_time(candidate, penalty_point, instance, iteration_no, probe_iteration_no=100):
+    probe_iteration_no = min(probe_iteration_no, iteration_no)
+    start = timer()
+    tabu_search(candidate, penalty_point, instance, probe_iteration_no, seed=0)
+    return (timer() - start) * iteration_no / probe_iteration_no
@@ -0,0 +1,143 @@
+import json
+import numpy as np
+from collections import namedtuple
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+# counters are stored in an int64 array so that compiled functions can update them
+# compiled functions take counters=None by default, hence counting is compiled away when telemetry is disabled
+# indices are compiled into cached functions, hence new counters are appended instead of inserted
+neighbourhood_structure_no = 4
+counter_names = (["evaluations", "delta_evaluations"] +
+                 [f"moves_tried{structure + 1}" for structure in range(neighbourhood_structure_no)] +
+                 [f"moves_accepted{structure + 1}" for structure in range(neighbourhood_structure_no)] +
+                 [f"rejection_spins{structure + 1}" for structure in range(neighbourhood_structure_no)] +
+                 ["mutation_spins", "repair_retries", "random_slot_misses"] +
+                 [f"moves_improving{structure + 1}" for structure in range(neighbourhood_structure_no)] +
+                 ["cache_hits", "cache_misses", "tabu_evaluations", "tabu_aspirations"])
+counter_no = len(counter_names)
+
+# index of each counter (counters of neighbourhood structures start from the index of structure 1)
+evaluations = counter_names.index("evaluations")
+delta_evaluations = counter_names.index("delta_evaluations")
+moves_tried = counter_names.index("moves_tried1")
+moves_accepted = counter_names.index("moves_accepted1")
+moves_improving = counter_names.index("moves_improving1")
+rejection_spins = counter_names.index("rejection_spins1")
+mutation_spins = counter_names.index("mutation_spins")
+repair_retries = counter_names.index("repair_retries")
+random_slot_misses = counter_names.index("random_slot_misses")
+cache_hits = counter_names.index("cache_hits")
+cache_misses = counter_names.index("cache_misses")
+tabu_evaluations = counter_names.index("tabu_evaluations")
+tabu_aspirations = counter_names.index("tabu_aspirations")
+
+# counters and outputs of a run, events are passed to the callback and appended to the JSON-lines sink
+Telemetry = namedtuple("Telemetry", ["counters", "callback", "sink", "start"])
+
+
+# create telemetry with a callback taking an event dictionary and/or a path of a JSON-lines file
+def create(callback=None, path=None):
+    sink = open(path, 'a') if path is not None else None
+    return Telemetry(new_counters(), callback, sink, timer())
+
+
+# zero counters
+def new_counters():
+    return np.zeros(counter_no, dtype=np.int64)
+
+
+# counters to be passed to compiled functions (None if telemetry is disabled)
+def counters_of(telemetry):
+    return None if telemetry is None else telemetry.counters
+
+
+# add counters collected by a worker process
+def add_counters(telemetry, counters):
+    if telemetry is not None and counters is not None:
+        telemetry.counters[:] += counters
+
+
+# add hits and misses of a penalty cache since its statistics were copied
+def add_cache_statistics(counters, cache, statistics):
+    if counters is not None and cache is not None:
+        counters[cache_hits] += cache.statistics[1] - statistics[1]
+        counters[cache_misses] += cache.statistics[2] - statistics[2]
+
+
+# record an event with the time since telemetry was created
+def record(telemetry, event, **fields):
+    if telemetry is None:
+        return
+
+    entry = {"event": event, "time": round(timer() - telemetry.start, 6)}
+    entry.update(fields)
+
+    if telemetry.callback is not None:
+        telemetry.callback(entry)
+
+    if telemetry.sink is not None:
+        telemetry.sink.write(json.dumps(entry) + "\n")
+        telemetry.sink.flush()
+
+
+# record wall time of a phase
+@contextmanager
+def phase(telemetry, name):
+    start = timer()
+
+    try:
+        yield
+    finally:
+        record(telemetry, "phase", name=name, seconds=round(timer() - start, 6))
+
+
+# record the value of each counter
+def record_counters(telemetry):
+    if telemetry is not None:
+        record(telemetry, "counters", **{name: int(value) for name, value in zip(counter_names, telemetry.counters)})
+
+
+# record success rate and cost of each neighbourhood structure of simulated annealing
+# cost is the number of proposals (including rejected proposals) per move tried
+def record_operators(telemetry):
+    if telemetry is None:
+        return
+
+    counters = telemetry.counters
+    operators = []
+
+    for structure in range(neighbourhood_structure_no):
+        tried = max(int(counters[moves_tried + structure]), 1)
+        operators.append({"neighbourhood_structure": structure + 1,
+                          "moves_tried": int(counters[moves_tried + structure]),
+                          "acceptance_rate": round(counters[moves_accepted + structure] / tried, 6),
+                          "improvement_rate": round(counters[moves_improving + structure] / tried, 6),
+                          "cost": round(1 + counters[rejection_spins + structure] / tried, 6)})
+
+    record(telemetry, "operators", operators=operators)
+
+
+# record hit rate of penalty caches
+def record_cache(telemetry):
+    if telemetry is None:
+        return
+
+    lookups = int(telemetry.counters[cache_hits] + telemetry.counters[cache_misses])
+
+    if lookups > 0:
+        record(telemetry, "penalty_cache", lookups=lookups,
+               hit_rate=round(int(telemetry.counters[cache_hits]) / lookups, 6))
+
+
+# record final counters and close the sink
+def close(telemetry):
+    if telemetry is None:
+        return
+
+    record_counters(telemetry)
+    record_operators(telemetry)
+    record_cache(telemetry)
+
+    if telemetry.sink is not None:
+        telemetry.sink.close()
@@ -0,0 +1,86 @@
+from penalty_function import penalty
+import numpy as np
+from collections import namedtuple
+from timeit import default_timer as timer
+
+# stopping criteria of genetic algorithm and simulated annealing, checked between segments of compiled iterations
+# deadline: time (of timer) after which a run stops (None if there is no time budget)
+# target_penalty_point: a run stops once its best schedule violates no hard constraint and its penalty points of soft
+# constraints are at most the target (None if there is no target)
+# stall_limit: a run stops after stall_limit iterations (generations of GA) without improvement (None if no limit)
+Termination = namedtuple("Termination", ["deadline", "target_penalty_point", "stall_limit"])
+
+
+# create stopping criteria with a time budget in seconds from now
+def create(time_budget=None, target_penalty_point=None, stall_limit=None):
+    return Termination(None if time_budget is None else timer() + time_budget, target_penalty_point, stall_limit)
+
+
+# seconds left until the deadline (infinite if there is no time budget)
+def remaining_time(termination):
+    if termination is None or termination.deadline is None:
+        return np.inf
+
+    return max(termination.deadline - timer(), 0.0)
+
+
+# stopping criteria of an earlier phase which leaves seconds of the time budget to later phases
+def reserve(termination, seconds):
+    if termination is None or termination.deadline is None:
+        return termination
+
+    return termination._replace(deadline=termination.deadline - seconds)
+
+
+# check if the best schedule has reached the target
+# penalty points of a schedule violating a hard constraint are at least 1000, hence hard constraints are only counted
+# once the penalty points are at most the target
+def is_reached(termination, best_penalty_point, best_presentation_slot, instance):
+    if termination is None or termination.target_penalty_point is None:
+        return False
+
+    return best_penalty_point <= termination.target_penalty_point and \
+        penalty(best_presentation_slot, instance)[1] == 0
+
+
+# check if the best penalty points did not improve in the last stall_limit iterations
+# plot_data is a list of traces of best penalty points of consecutive iterations (only the last traces are read)
+def is_stalled(termination, plot_data):
+    if termination is None or termination.stall_limit is None:
+        return False
+
+    recent_plot_data = []
+    length = 0
+
+    for trace in reversed(plot_data):
+        recent_plot_data.insert(0, trace)
+        length += len(trace)
+
+        if length > termination.stall_limit:
+            break
+
+    recent_plot_data = np.concatenate(recent_plot_data)
+    return len(recent_plot_data) > termination.stall_limit and \
+        recent_plot_data[-1] == recent_plot_data[-termination.stall_limit - 1]
+
+
+# reason to stop a run (None if it continues): time_budget, target or stall
+def stop_reason(termination, best_penalty_point, best_presentation_slot, instance, plot_data):
+    if termination is None:
+        return None
+    elif remaining_time(termination) == 0:
+        return "time_budget"
+    elif is_reached(termination, best_penalty_point, best_presentation_slot, instance):
+        return "target"
+    elif is_stalled(termination, plot_data):
+        return "stall"
+
+    return None
+
+
+# factor of a geometric annealing schedule to cool from temperature to final temperature in iteration_no iterations
+def cooling_factor(temperature, final_temperature, iteration_no):
+    if temperature <= final_temperature or final_temperature <= 0:
+        return 1.0
+
+    return (final_temperature / temperature) ** (1 / max(iteration_no, 1))
@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# problem instance kept by each worker process so that only candidates are sent with each task
+worker_instance = None
+
+
+# store problem instance in a worker process
+def initialize_worker(instance):
+    global worker_instance
+    worker_instance = instance
+
+
+# create a process pool with 1 worker per task (up to the number of processor cores)
+# tasks run in the current process if there is only 1 worker
+def create_pool(task_no, instance):
+    worker_no = min(task_no, os.cpu_count())
+
+    if worker_no == 1:
+        initialize_worker(instance)
+        return None
+
+    return ProcessPoolExecutor(worker_no, initializer=initialize_worker, initargs=(instance,))
+
+
+# run tasks on the pool and collect their results in order
+def run_tasks(pool, task, arguments):
+    if pool is None:
+        return [task(*argument) for argument in arguments]
+
+    futures = [pool.submit(task, *argument) for argument in arguments]
+    return [future.result() for future in futures]
+
+
+# shut down the pool after all tasks have finished
+def close_pool(pool):
+    if pool is not None:
+        pool.shutdown()